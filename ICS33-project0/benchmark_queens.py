@@ -0,0 +1,214 @@
+# benchmark_queens.py
+"""benchmark_queens.py measures how quickly QueensState's operations run"""
+# ICS 33 Spring 2025
+# Project 0: History of Modern
+#
+# Run this script to time QueensState's operations on boards of various sizes
+# holding various numbers of queens, and to measure how much memory each
+# operation allocates at its peak.  Each measurement is taken for QueensState
+# and for a simple list-based representation of the same board, so that the
+# two can be compared.  The results are written as JSON, so they can be saved
+# and compared against the results from earlier versions of queens.py, e.g.:
+#
+#     python benchmark_queens.py --sizes 8 64 --queens 8 64 -o before.json
+
+import argparse
+from collections.abc import Callable
+import json
+import platform
+import random
+import sys
+import timeit
+import tracemalloc
+from queens import QueensState, Position, DuplicateQueenError
+
+
+class ListQueensState:
+    """Represents a chessboard the simplest way: as a list of the positions
+    of its queens, every one of which each query looks through.  It serves as
+    the baseline against which QueensState is measured."""
+
+    def __init__(self, rows: int, columns: int):
+        """Initializes the chessboard to have the given numbers
+        of rows and columns, with no queens occupying any of its cells."""
+        self.rows = rows
+        self.columns = columns
+        self.queen_position = []
+
+    def has_queen(self, position: Position) -> bool:
+        """Returns True if a queen occupies
+        the given position on the chessboard, or False otherwise."""
+        return position in self.queen_position
+
+    def any_queens_unsafe(self) -> bool:
+        """Returns True if any queens on the chessboard are unsafe
+        or False otherwise."""
+        queens = self.queen_position
+        for i, q1 in enumerate(queens):
+            for q2 in queens[i + 1:]:
+                if q1.column == q2.column or q1.row == q2.row:
+                    return True
+                if abs(q1.column - q2.column) == abs(q1.row - q2.row):
+                    return True
+        return False
+
+    def with_queens_added(
+            self, positions: list[Position]) -> 'ListQueensState':
+        """Builds a new ListQueensState with queens added in the given
+        positions, without modifying 'self' in any way."""
+        new_queen_position = list(self.queen_position)
+        for position in positions:
+            if position in new_queen_position:
+                raise DuplicateQueenError(position)
+            new_queen_position.append(position)
+        new_state = ListQueensState(self.rows, self.columns)
+        new_state.queen_position = new_queen_position
+        return new_state
+
+
+REPRESENTATIONS = {
+    'QueensState': QueensState,
+    'list': ListQueensState
+}
+
+OPERATIONS = ['build', 'with_queens_added', 'has_queen', 'any_queens_unsafe']
+
+
+def main() -> None:
+    """Benchmarks every combination of the board sizes, numbers of queens
+    and representations given on the command line, writing the results as
+    JSON."""
+    arguments = _parse_arguments()
+    results = []
+    for size in arguments.sizes:
+        for queen_count in arguments.queens:
+            if queen_count >= size * size:
+                continue
+            for name in arguments.representations:
+                results.extend(benchmark(
+                    REPRESENTATIONS[name], name, size, size, queen_count,
+                    arguments.repeat, arguments.seed))
+                _report_progress(results[-len(OPERATIONS):])
+
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'results': results
+    }
+    if arguments.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(arguments.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+
+
+def benchmark(
+        representation: type, name: str, rows: int, columns: int,
+        queen_count: int, repeat: int, seed: int) -> list[dict]:
+    """Measures each of the operations on a board with the given dimensions
+    and number of queens, stored using the given representation, returning
+    one result per operation.  The same seed always places the same queens,
+    so results for different representations can be compared directly."""
+    generator = random.Random(seed)
+    cells = generator.sample(range(rows * columns), queen_count + 1)
+    positions = [Position(*divmod(cell, columns)) for cell in cells]
+    placed, extra = positions[:-1], positions[-1]
+    probes = [Position(generator.randrange(rows), generator.randrange(columns))
+              for _ in range(64)]
+
+    def build():
+        state = representation(rows, columns)
+        state.queen_position = placed
+        return state.any_queens_unsafe()
+
+    state = representation(rows, columns)
+    state.queen_position = placed
+    state.any_queens_unsafe()
+
+    operations = {
+        'build': build,
+        'with_queens_added': lambda: state.with_queens_added([extra]),
+        'has_queen': lambda: [state.has_queen(probe) for probe in probes],
+        'any_queens_unsafe': state.any_queens_unsafe
+    }
+    calls_per_run = {'has_queen': len(probes)}
+
+    results = []
+    for operation in OPERATIONS:
+        seconds = _time(operations[operation], repeat)
+        results.append({
+            'representation': name,
+            'operation': operation,
+            'rows': rows,
+            'columns': columns,
+            'queens': queen_count,
+            'seconds_per_call': seconds / calls_per_run.get(operation, 1),
+            'peak_bytes': _peak_allocation(operations[operation])
+        })
+    return results
+
+
+def _time(operation: Callable[[], object], repeat: int) -> float:
+    """Returns the fastest time, in seconds, that one call to the given
+    operation took, out of the given number of measurements."""
+    timer = timeit.Timer(operation)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def _peak_allocation(operation: Callable[[], object]) -> int:
+    """Returns the largest number of bytes that were allocated at once
+    during one call to the given operation."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def _report_progress(results: list[dict]) -> None:
+    """Writes a line summarizing the given results to the standard error,
+    so the standard output is left holding only JSON."""
+    summary = ', '.join(
+        f"{result['operation']} {result['seconds_per_call'] * 1e6:.2f}us"
+        for result in results)
+    first = results[0]
+    print(f"{first['representation']} {first['rows']}x{first['columns']} "
+          f"with {first['queens']} queens: {summary}", file=sys.stderr)
+
+
+def _parse_arguments() -> argparse.Namespace:
+    """Returns the command-line arguments, with defaults for the ones that
+    aren't given."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the operations of QueensState.')
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[8, 64, 512],
+        help='numbers of rows (and columns) of the boards to measure')
+    parser.add_argument(
+        '--queens', type=int, nargs='+', default=[8, 64, 512],
+        help='numbers of queens to place on each board')
+    parser.add_argument(
+        '--representations', nargs='+', default=list(REPRESENTATIONS),
+        choices=list(REPRESENTATIONS),
+        help='the representations of the board to measure')
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='how many times to repeat each measurement, keeping the best')
+    parser.add_argument(
+        '--seed', type=int, default=33,
+        help='seeds the random placement of queens')
+    parser.add_argument(
+        '-o', '--output',
+        help='the file to write results to, instead of the standard output')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
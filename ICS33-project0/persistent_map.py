@@ -0,0 +1,261 @@
+"""persistent_map.py contains an immutable map that shares structure
+between versions"""
+# ICS 33 Spring 2025
+# Project 0: History of Modern
+#
+# A PersistentMap is a hash array mapped trie: a tree of nodes that each
+# branch 32 ways on five bits of a key's hash.  Building a new version of the
+# map with one key set or deleted copies only the nodes along the path to that
+# key -- O(log n) of them -- and shares every other node with the version it
+# was built from, so keeping many related versions alive is cheap.
+
+from collections.abc import Iterator
+from typing import Any, Self
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
+
+
+class _Node:
+    """A node that branches on five bits of the hash.  Its bitmap says which
+    of its 32 branches are present, and its slots hold only those branches,
+    in order: either (hash, key, value) leaves or deeper nodes."""
+    __slots__ = ('bitmap', 'slots')
+
+    def __init__(self, bitmap: int, slots: tuple):
+        self.bitmap = bitmap
+        self.slots = slots
+
+
+class _CollisionNode:
+    """A node holding the (key, value) pairs of keys
+    whose hashes are identical in all 64 bits."""
+    __slots__ = ('hash', 'pairs')
+
+    def __init__(self, key_hash: int, pairs: tuple):
+        self.hash = key_hash
+        self.pairs = pairs
+
+
+_EMPTY_NODE = _Node(0, ())
+
+
+class PersistentMap:
+    """Immutably maps hashable keys to values.  Methods that would change
+    the map instead return a new map sharing most of its structure."""
+    __slots__ = ('_root', '_size')
+
+    def __init__(self):
+        """Initializes an empty map."""
+        self._root = _EMPTY_NODE
+        self._size = 0
+
+    @classmethod
+    def from_items(cls, items) -> Self:
+        """Builds a map from an iterable of (key, value) pairs in one pass,
+        which is much faster than setting the keys one at a time.  When a key
+        appears more than once, its last value is the one kept."""
+        pairs = dict(items)
+        if not pairs:
+            return _EMPTY_MAP
+        root = _build(
+            [(hash(key) & _HASH_MASK, key, value)
+             for key, value in pairs.items()], 0)
+        return _EMPTY_MAP._with_root(root, len(pairs))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self) -> Iterator:
+        return (key for key, _ in self.items())
+
+    def get(self, key, default=None) -> Any:
+        """Returns the value associated with the given key,
+        or the default if the key is not in the map."""
+        key_hash = hash(key) & _HASH_MASK
+        node = self._root
+        shift = 0
+        while True:
+            if type(node) is _CollisionNode:
+                for pair_key, pair_value in node.pairs:
+                    if pair_key == key:
+                        return pair_value
+                return default
+            bit = 1 << ((key_hash >> shift) & _MASK)
+            if not node.bitmap & bit:
+                return default
+            slot = node.slots[(node.bitmap & (bit - 1)).bit_count()]
+            if type(slot) is tuple:
+                if slot[0] == key_hash and slot[1] == key:
+                    return slot[2]
+                return default
+            node = slot
+            shift += _BITS
+
+    def items(self) -> Iterator[tuple]:
+        """Iterates over the (key, value) pairs in the map,
+        in no particular order."""
+        return _items(self._root)
+
+    def set(self, key, value) -> Self:
+        """Returns a map like this one,
+        except that the given key is associated with the given value."""
+        root, added = _set(
+            self._root, 0, hash(key) & _HASH_MASK, key, value)
+        if root is self._root:
+            return self
+        return self._with_root(root, self._size + added)
+
+    def delete(self, key) -> Self:
+        """Returns a map like this one, except without the given key.
+        Raises a KeyError if the key is not in the map."""
+        root = _delete(self._root, 0, hash(key) & _HASH_MASK, key)
+        if type(root) is tuple:
+            root = _Node(1 << (root[0] & _MASK), (root,))
+        elif root is None:
+            root = _EMPTY_NODE
+        return self._with_root(root, self._size - 1)
+
+    def _with_root(self, root: _Node, size: int) -> Self:
+        """Builds a new map from the given root node and size."""
+        new_map = PersistentMap.__new__(PersistentMap)
+        new_map._root = root
+        new_map._size = size
+        return new_map
+
+
+_MISSING = object()
+_EMPTY_MAP = PersistentMap()
+
+
+def _build(leaves: list[tuple], shift: int):
+    """Builds the subtree holding two or more leaves, whose hashes agree in
+    all of the bits below the given shift."""
+    if shift >= _HASH_BITS:
+        return _CollisionNode(
+            leaves[0][0], tuple((key, value) for _, key, value in leaves))
+    buckets = {}
+    for leaf in leaves:
+        fragment = (leaf[0] >> shift) & _MASK
+        if fragment in buckets:
+            buckets[fragment].append(leaf)
+        else:
+            buckets[fragment] = [leaf]
+    bitmap = 0
+    slots = []
+    for fragment in sorted(buckets):
+        bitmap |= 1 << fragment
+        bucket = buckets[fragment]
+        slots.append(
+            bucket[0] if len(bucket) == 1 else _build(bucket, shift + _BITS))
+    return _Node(bitmap, tuple(slots))
+
+
+def _items(node) -> Iterator[tuple]:
+    """Iterates over the (key, value) pairs stored beneath the given node."""
+    if type(node) is _CollisionNode:
+        yield from node.pairs
+        return
+    for slot in node.slots:
+        if type(slot) is tuple:
+            yield slot[1], slot[2]
+        else:
+            yield from _items(slot)
+
+
+def _set(node, shift: int, key_hash: int, key, value) -> tuple[Any, bool]:
+    """Returns a copy of the given node with the key set to the value,
+    along with whether the key was newly added rather than replaced.
+    Returns the node itself if the key already had that value."""
+    if type(node) is _CollisionNode:
+        pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+        added = len(pairs) == len(node.pairs)
+        return _CollisionNode(key_hash, pairs + ((key, value),)), added
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    index = (node.bitmap & (bit - 1)).bit_count()
+    slots = node.slots
+
+    if not node.bitmap & bit:
+        leaf = (key_hash, key, value)
+        return _Node(node.bitmap | bit,
+                     slots[:index] + (leaf,) + slots[index:]), True
+
+    slot = slots[index]
+    if type(slot) is tuple:
+        if slot[0] == key_hash and slot[1] == key:
+            if slot[2] is value:
+                return node, False
+            replacement, added = (key_hash, key, value), False
+        else:
+            replacement, added = _merge(
+                shift + _BITS, slot, (key_hash, key, value)), True
+    else:
+        replacement, added = _set(slot, shift + _BITS, key_hash, key, value)
+        if replacement is slot:
+            return node, False
+
+    return _Node(node.bitmap,
+                 slots[:index] + (replacement,) + slots[index + 1:]), added
+
+
+def _merge(shift: int, first: tuple, second: tuple):
+    """Builds the smallest subtree holding two leaves whose
+    hashes agree in all of the bits below the given shift."""
+    if shift >= _HASH_BITS:
+        return _CollisionNode(
+            first[0], ((first[1], first[2]), (second[1], second[2])))
+    first_fragment = (first[0] >> shift) & _MASK
+    second_fragment = (second[0] >> shift) & _MASK
+    if first_fragment == second_fragment:
+        return _Node(1 << first_fragment,
+                     (_merge(shift + _BITS, first, second),))
+    if first_fragment > second_fragment:
+        first, second = second, first
+    return _Node((1 << first_fragment) | (1 << second_fragment),
+                 (first, second))
+
+
+def _delete(node, shift: int, key_hash: int, key):
+    """Returns a copy of the given node without the key.  The result is None
+    if nothing would be left, or a lone leaf that the parent should hold in
+    place of this node.  Raises a KeyError if the key is not present."""
+    if type(node) is _CollisionNode:
+        pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+        if len(pairs) == len(node.pairs):
+            raise KeyError(key)
+        if len(pairs) == 1:
+            return key_hash, pairs[0][0], pairs[0][1]
+        return _CollisionNode(key_hash, pairs)
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    if not node.bitmap & bit:
+        raise KeyError(key)
+    index = (node.bitmap & (bit - 1)).bit_count()
+    slots = node.slots
+    slot = slots[index]
+
+    if type(slot) is tuple:
+        if slot[0] != key_hash or slot[1] != key:
+            raise KeyError(key)
+        replacement = None
+    else:
+        replacement = _delete(slot, shift + _BITS, key_hash, key)
+
+    if replacement is None:
+        slots = slots[:index] + slots[index + 1:]
+        if not slots:
+            return None
+        if len(slots) == 1 and type(slots[0]) is tuple:
+            return slots[0]
+        return _Node(node.bitmap & ~bit, slots)
+
+    if len(slots) == 1 and type(replacement) is tuple:
+        return replacement
+    return _Node(node.bitmap,
+                 slots[:index] + (replacement,) + slots[index + 1:])
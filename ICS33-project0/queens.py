@@ -4,10 +4,9 @@
 # Project 0: History of Modern
 #
 # A module containing tools that could assist in solving variants of the
-# well-known "n-queens" problem.  Note that we're only implementing one part
-# of the problem: immutably managing the "state" of the board (i.e., which
-# queens are arranged in which cells).  The rest of the problem -- determining
-# a valid solution for it -- is not our focus here.
+# well-known "n-queens" problem.  Its core is immutably managing the "state"
+# of the board (i.e., which queens are arranged in which cells), while solve()
+# builds on that to determine a valid solution.
 #
 # Your goal is to complete the QueensState class described below, though
 # you'll need to build it incrementally, as well as test it incrementally by
@@ -17,8 +16,25 @@
 #
 # DO NOT MODIFY THE Position NAMEDTUPLE OR THE PROVIDED EXCEPTION CLASSES.
 
+from array import array
+import asyncio
 from collections import namedtuple
+from collections.abc import Callable, Iterable, Iterator, Sequence
+import concurrent.futures
+import contextlib
+import functools
+import math
+import multiprocessing
+import os
+import random
+import time
 from typing import Self
+from persistent_map import PersistentMap
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 Position = namedtuple('Position', ['row', 'column'])
 
@@ -62,6 +78,23 @@ class QueensState:
     """Immutably represents the state of a chessboard being used to assist in
     solving the n-queens problem."""
 
+    # Since a search can keep a great many states alive at once, states are
+    # kept compact: there's no per-instance dictionary, and the queens are
+    # stored as integer codes (row * columns + column) in a packed array,
+    # with Position objects built only when they're asked for.  Queens can
+    # also be placed off the board, as they always could; their positions
+    # are numbered after the board's cells, as _off_board_code() describes.
+    #
+    # The index records, for each row, column, diagonal and anti-diagonal,
+    # which queens occupy it: a line with one queen holds just that queen's
+    # code, while a line with more holds a PersistentMap whose keys are their
+    # codes, so a query about a line takes time proportional to its queens.
+    # The lines holding more than one queen, whose queens are therefore in
+    # conflict, are also kept in a PersistentMap of their own.
+    __slots__ = ('rows', 'columns', '_queen_codes', '_occupied',
+                 '_line_queens', '_crowded_lines', '_conflicts',
+                 '_next_order', '_symmetry_hashes', '_attack_masks')
+
     def __init__(self, rows: int, columns: int):
         """Initializes the chessboard to have the given numbers
         of rows and columns, with no queens occupying any of its cells."""
@@ -69,9 +102,188 @@ class QueensState:
         self.columns = columns
         self.queen_position = []
 
+    @property
+    def queen_position(self) -> list[Position]:
+        """The positions of the queens on the chessboard,
+        in the order they were added."""
+        return list(map(self._position, self._codes()))
+
+    @queen_position.setter
+    def queen_position(self, positions: list[Position]) -> None:
+        """Replaces the queens on the chessboard.  Raises a
+        DuplicateQueenError when the same position appears more than once."""
+        self._set_codes(array('Q', map(self._code, positions)))
+
+    def _set_codes(self, codes: array) -> None:
+        """Replaces the queens on the chessboard with the ones in the cells
+        with the given codes, raising a DuplicateQueenError if a code
+        appears more than once.
+
+        The index for the new queens is built the first time it's needed, so
+        a board with a great many queens can be set up cheaply, but the first
+        query about it takes time proportional to the number of queens.
+        has_queen() builds only the part of the index recording which cells
+        are occupied, and a board already known to have no conflicts can be
+        asked about them without building any of it."""
+        if len(set(codes)) != len(codes):
+            seen = set()
+            for code in codes:
+                if code in seen:
+                    raise DuplicateQueenError(self._position(code))
+                seen.add(code)
+        self._replace_codes(codes)
+
+    def _replace_codes(self, codes: array) -> None:
+        """Replaces the queens on the chessboard with the ones in the cells
+        with the given codes, which must all be different."""
+        self._queen_codes = codes
+        self._occupied = None
+        self._line_queens = None
+        self._conflicts = None
+        self._symmetry_hashes = None
+        self._attack_masks = None
+
+    def _code(self, position: Position) -> int:
+        """Returns the code for the given position."""
+        row, column = position
+        if 0 <= row < self.rows and 0 <= column < self.columns:
+            return row * self.columns + column
+        return _off_board_code(row, column, self.rows, self.columns)
+
+    def _position(self, code: int) -> Position:
+        """Returns the position with the given code."""
+        if code < self.rows * self.columns:
+            return Position(*divmod(code, self.columns))
+        return Position(*_cell(code, self.rows, self.columns))
+
+    def _codes(self) -> array:
+        """Returns the codes of the queens on the chessboard in the order
+        they were added, recovering them from the index if necessary."""
+        if self._queen_codes is None:
+            self._queen_codes = array('Q', (
+                code for code, _ in sorted(
+                    self._occupied.items(), key=lambda item: item[1])))
+        return self._queen_codes
+
+    def _occupancy(self) -> PersistentMap:
+        """Returns the map from the codes of the queens on the chessboard to
+        the order in which they were added, building it if it hasn't been
+        built already."""
+        if self._occupied is None:
+            codes = self._queen_codes
+            self._occupied = PersistentMap.from_items(
+                zip(codes, range(len(codes))))
+            self._next_order = len(codes)
+        return self._occupied
+
+    def _index(self) -> Self:
+        """Builds the index for the queens on the chessboard in one pass,
+        if it hasn't been built already, then returns 'self'."""
+        if self._line_queens is not None:
+            return self
+        self._occupancy()
+        codes = self._queen_codes
+        rows, columns = self.rows, self.columns
+        line_queens = ({}, {}, {}, {})
+        for code in codes:
+            for line, queens_in_line in zip(
+                    _lines(*_cell(code, rows, columns)), line_queens):
+                if line in queens_in_line:
+                    queens_in_line[line].append(code)
+                else:
+                    queens_in_line[line] = [code]
+        self._line_queens = tuple(
+            PersistentMap.from_items(
+                (line, line_codes[0] if len(line_codes) == 1
+                 else PersistentMap.from_items(
+                     zip(line_codes, range(len(line_codes)))))
+                for line, line_codes in queens_in_line.items())
+            for queens_in_line in line_queens)
+        self._crowded_lines = PersistentMap.from_items(
+            ((kind, line), True)
+            for kind, queens_in_line in enumerate(line_queens)
+            for line, line_codes in queens_in_line.items()
+            if len(line_codes) > 1)
+        self._conflicts = sum(
+            len(line_codes) * (len(line_codes) - 1) // 2
+            for queens_in_line in line_queens
+            for line_codes in queens_in_line.values())
+        return self
+
+    def _add_to_index(self, positions: list[Position]) -> None:
+        """Records queens in the given positions in this state's index,
+        raising a DuplicateQueenError for any position already occupied.
+
+        The index is persistent: every map in it is a PersistentMap, so the
+        updated index shares most of its structure with the one it replaces,
+        which a parent state may still be using."""
+        occupied = self._occupied
+        line_queens = list(self._line_queens)
+        crowded_lines = self._crowded_lines
+        for position in positions:
+            code = self._code(position)
+            if code in occupied:
+                raise DuplicateQueenError(position)
+            occupied = occupied.set(code, self._next_order)
+            self._next_order += 1
+            self._rehash(position, 1)
+            self._remask(position, 1)
+            for kind, line in enumerate(_lines(*position)):
+                line_codes = line_queens[kind].get(line)
+                if line_codes is None:
+                    line_codes = code
+                else:
+                    if type(line_codes) is int:
+                        line_codes = _NO_QUEENS.set(line_codes, True)
+                        crowded_lines = crowded_lines.set((kind, line), True)
+                    self._conflicts += len(line_codes)
+                    line_codes = line_codes.set(code, True)
+                line_queens[kind] = line_queens[kind].set(line, line_codes)
+        self._occupied = occupied
+        self._line_queens = tuple(line_queens)
+        self._crowded_lines = crowded_lines
+        self._queen_codes = None
+
+    def _remove_from_index(self, positions: list[Position]) -> None:
+        """Forgets queens in the given positions from this state's index,
+        raising a MissingQueenError for any position that is not occupied."""
+        occupied = self._occupied
+        line_queens = list(self._line_queens)
+        crowded_lines = self._crowded_lines
+        for position in positions:
+            code = self._code(position)
+            if code not in occupied:
+                raise MissingQueenError(position)
+            occupied = occupied.delete(code)
+            self._rehash(position, -1)
+            for kind, line in enumerate(_lines(*position)):
+                line_codes = line_queens[kind].get(line)
+                if type(line_codes) is int:
+                    line_queens[kind] = line_queens[kind].delete(line)
+                    continue
+                line_codes = line_codes.delete(code)
+                self._conflicts -= len(line_codes)
+                if len(line_codes) == 1:
+                    line_codes, = line_codes
+                    crowded_lines = crowded_lines.delete((kind, line))
+                line_queens[kind] = line_queens[kind].set(line, line_codes)
+            if self._attack_masks is not None:
+                self._remask(position, 0, line_queens)
+        self._occupied = occupied
+        self._line_queens = tuple(line_queens)
+        self._crowded_lines = crowded_lines
+        self._queen_codes = None
+
+    def _on_board(self, position: Position) -> bool:
+        """Returns True if the given position is on the chessboard."""
+        return (0 <= position[0] < self.rows
+                and 0 <= position[1] < self.columns)
+
     def queen_count(self) -> int:
         """Returns the number of queens on the chessboard."""
-        return len(self.queen_position)
+        if self._occupied is None:
+            return len(self._queen_codes)
+        return len(self._occupied)
 
     def queens(self) -> list[Position]:
         """Returns a list of the positions where queens appear on the board,
@@ -81,45 +293,1351 @@ class QueensState:
     def has_queen(self, position: Position) -> bool:
         """Returns True if a queen occupies
         the given position on the chessboard, or False otherwise."""
-        return position in self.queens()
+        return self._code(position) in self._occupancy()
 
     def any_queens_unsafe(self) -> bool:
         """Returns True if any queens on the chessboard are unsafe
         or False otherwise."""
-        if self.queen_count() < 2:
+        if self._conflicts is None:
+            self._index()
+        return self._conflicts > 0
+
+    def first_conflict(self) -> tuple[Position, Position] | None:
+        """Returns the positions of two queens that attack each other, or
+        None if all of the queens are safe.  This takes about the same time
+        no matter how many queens are on the chessboard."""
+        if self._conflicts == 0:
+            return None
+        for kind, line in self._index()._crowded_lines:
+            line_codes = iter(self._line_codes(kind, line))
+            first, second = next(line_codes), next(line_codes)
+            return self._position(first), self._position(second)
+        return None
+
+    def conflicting_pairs(self) -> list[tuple[Position, Position]]:
+        """Returns a list of every pair of positions of queens that attack
+        each other, arranged in no particular order.  This takes time
+        proportional to the number of pairs, no matter how many safe queens
+        there are."""
+        if self._conflicts == 0:
+            return []
+        pairs = []
+        for kind, line in self._index()._crowded_lines:
+            positions = self._queens_in_line(kind, line)
+            for index, first in enumerate(positions):
+                for second in positions[index + 1:]:
+                    pairs.append((first, second))
+        return pairs
+
+    def queens_in_row(self, row: int) -> list[Position]:
+        """Returns a list of the positions of the queens in the given row,
+        arranged in no particular order.  This takes time proportional to
+        the number of those queens, no matter how many others there are."""
+        return self._queens_in_line(_ROW, row)
+
+    def queens_in_column(self, column: int) -> list[Position]:
+        """Returns a list of the positions of the queens in the given column,
+        arranged in no particular order.  This takes time proportional to
+        the number of those queens, no matter how many others there are."""
+        return self._queens_in_line(_COLUMN, column)
+
+    def attackers_of(self, position: Position) -> list[Position]:
+        """Returns a list of the positions of the queens that attack the
+        given position, i.e., those sharing its row, column or either of its
+        diagonals, arranged in no particular order.  A queen in the given
+        position doesn't attack itself, and a position that isn't on the
+        chessboard has no attackers."""
+        if not self._on_board(position):
+            return []
+        code = self._code(position)
+        return [
+            self._position(line_code)
+            for kind, line in enumerate(_lines(*position))
+            for line_code in self._line_codes(kind, line)
+            if line_code != code]
+
+    def is_attacked(self, position: Position) -> bool:
+        """Returns True if any queen attacks the given position,
+        or False otherwise."""
+        if not self._on_board(position):
             return False
-        queens = self.queens()
-        for i, q1 in enumerate(queens):
-            for q2 in queens[i+1:]:
-                if q1.column == q2.column or q1.row == q2.row:
-                    return True
-                if abs(q1.column - q2.column) == abs(q1.row - q2.row):
-                    return True
-        return False
+        code = self._code(position)
+        return any(
+            line_code != code
+            for kind, line in enumerate(_lines(*position))
+            for line_code in self._line_codes(kind, line))
+
+    def safe_columns(self, row: int) -> list[int]:
+        """Returns a list, in ascending order, of the columns in the given
+        row where a queen could be added without being attacked by (or
+        attacking) any queen already on the chessboard."""
+        if not 0 <= row < self.rows or self._line_codes(_ROW, row):
+            return []
+        column_mask, diagonal_mask, anti_diagonal_mask = self._masks()
+        all_columns = (1 << self.columns) - 1
+        safe = all_columns & ~(
+            column_mask
+            | diagonal_mask >> (self.rows - 1 - row)
+            | anti_diagonal_mask >> row)
+        bits = bin(safe)[:1:-1]
+        columns = []
+        column = bits.find('1')
+        while column != -1:
+            columns.append(column)
+            column = bits.find('1', column + 1)
+        return columns
+
+    def _masks(self) -> tuple[int, int, int]:
+        """Returns the attack masks for the queens on the chessboard: bit c
+        of the first is set when column c holds a queen, bit (column - row +
+        rows - 1) of the second when that diagonal does, and bit (row +
+        column) of the third when that anti-diagonal does.  Lines that don't
+        cross the chessboard, which only queens off it can occupy, have no
+        bits.
+
+        Like the symmetry hashes, the masks are computed the first time
+        they're needed and then kept up to date as queens are added or
+        removed, so a search asking about many rows pays for them once."""
+        if self._attack_masks is None:
+            self._index()
+            self._attack_masks = tuple(
+                _mask(bit for bit in bits if 0 <= bit < limit)
+                for bits, limit in zip(
+                    (self._line_queens[_COLUMN],
+                     (self.rows - 1 - diagonal
+                      for diagonal in self._line_queens[_DIAGONAL]),
+                     self._line_queens[_ANTI_DIAGONAL]),
+                    self._mask_limits()))
+        return self._attack_masks
+
+    def _mask_limits(self) -> tuple[int, int, int]:
+        """Returns the number of bits in each of the attack masks."""
+        span = self.rows + self.columns - 1
+        return self.columns, span, span
+
+    def _remask(self, position: Position, sign: int,
+                line_queens: list[PersistentMap] | None = None) -> None:
+        """Updates this state's attack masks, if they've been computed, for
+        a queen that's been added to (if the sign is 1) or removed from (if
+        the sign is 0) the given position.  When a queen is removed, a line's
+        bit is cleared only if the given line index shows it's now empty."""
+        if self._attack_masks is None:
+            return
+        _, column, diagonal, anti_diagonal = _lines(*position)
+        bits = (column, self.rows - 1 - diagonal, anti_diagonal)
+        if not self._on_board(position):
+            # a line that doesn't cross the chessboard has no bit to set or
+            # clear
+            bits = tuple(
+                bit if 0 <= bit < limit else None
+                for bit, limit in zip(bits, self._mask_limits()))
+        if sign:
+            self._attack_masks = tuple(
+                mask if bit is None else mask | (1 << bit)
+                for mask, bit in zip(self._attack_masks, bits))
+        else:
+            self._attack_masks = tuple(
+                mask if bit is None or line in line_queens[kind]
+                else mask & ~(1 << bit)
+                for kind, mask, bit, line in zip(
+                    (_COLUMN, _DIAGONAL, _ANTI_DIAGONAL), self._attack_masks,
+                    bits, (column, diagonal, anti_diagonal)))
+
+    def _queens_in_line(self, kind: int, line: int) -> list[Position]:
+        """Returns a list of the positions of the queens in the given line
+        of the given kind."""
+        return list(map(self._position, self._line_codes(kind, line)))
+
+    def _line_codes(self, kind: int, line: int):
+        """Returns an iterable of the codes of the queens in the given line
+        of the given kind."""
+        line_codes = self._index()._line_queens[kind].get(line, _NO_QUEENS)
+        if type(line_codes) is int:
+            return (line_codes,)
+        return line_codes
 
     def with_queens_added(self, positions: list[Position]) -> Self:
         """Builds a new QueensState with queens added in the given positions,
         without modifying 'self' in any way.  Raises a DuplicateQueenError when
         there is already a queen in at least one of the given positions."""
-        new_queen_position = list(self.queen_position)
+        if not isinstance(positions, Sequence):
+            positions = list(positions)
+        if (len(positions) >= _BULK_ADD_THRESHOLD
+                and 2 * len(positions) >= self.queen_count()):
+            return self._with_queens_added_in_bulk(positions)
+        new_queen_state = self._copy()
+        new_queen_state._add_to_index(positions)
+        return new_queen_state
+
+    def _with_queens_added_in_bulk(
+            self, positions: Sequence[Position]) -> Self:
+        """Builds a new QueensState with queens added in the given positions,
+        checking all of them in one pass over a set of occupied cells and
+        leaving the new state's index to be rebuilt in one pass when it's
+        needed.  When a batch is large compared to the board, this is much
+        faster than updating the persistent index one queen at a time.
+
+        The positions are checked in order, so the error raised is the same
+        one with_queens_added() would raise for the first bad position,
+        whether it duplicates a queen on the board or one earlier in the
+        batch."""
+        codes = array('Q', self._codes())
+        occupied = set(codes)
         for position in positions:
-            if position in new_queen_position:
+            code = self._code(position)
+            if code in occupied:
                 raise DuplicateQueenError(position)
-            new_queen_position.append(position)
-        new_queen_state = QueensState(self.rows, self.columns)
-        new_queen_state.queen_position = new_queen_position
+            occupied.add(code)
+            codes.append(code)
+        new_queen_state = QueensState.__new__(QueensState)
+        new_queen_state.rows = self.rows
+        new_queen_state.columns = self.columns
+        new_queen_state._replace_codes(codes)
         return new_queen_state
 
     def with_queens_removed(self, positions: list[Position]) -> Self:
         """Builds a new QueensState with queens removed,
         without modifying 'self' in any way. Raises a MissingQueenError
         when there is no queen in at least one of the given positions."""
-        new_queen_position = list(self.queen_position)
-        for position in positions:
-            if position in new_queen_position:
-                new_queen_position.remove(position)
-            else:
-                raise MissingQueenError(position)
-        new_queen_state = QueensState(self.rows, self.columns)
-        new_queen_state.queen_position = new_queen_position
+        new_queen_state = self._copy()
+        new_queen_state._remove_from_index(positions)
+        return new_queen_state
+
+    def _copy(self) -> Self:
+        """Builds a new QueensState sharing this one's board and index.
+        Since the index is persistent, this takes constant time."""
+        self._index()
+        new_queen_state = QueensState.__new__(QueensState)
+        new_queen_state.rows = self.rows
+        new_queen_state.columns = self.columns
+        new_queen_state._occupied = self._occupied
+        new_queen_state._line_queens = self._line_queens
+        new_queen_state._crowded_lines = self._crowded_lines
+        new_queen_state._conflicts = self._conflicts
+        new_queen_state._next_order = self._next_order
+        new_queen_state._queen_codes = self._queen_codes
+        new_queen_state._symmetry_hashes = self._symmetry_hashes
+        new_queen_state._attack_masks = self._attack_masks
         return new_queen_state
+
+    def __eq__(self, other) -> bool:
+        """Returns True if the other object is a QueensState with the same
+        dimensions and queens in the same positions, or False otherwise."""
+        if not isinstance(other, QueensState):
+            return NotImplemented
+        return (self.rows == other.rows and self.columns == other.columns
+                and self.queen_count() == other.queen_count()
+                and self._hashes()[0] == other._hashes()[0]
+                and set(self._codes()) == set(other._codes()))
+
+    def __hash__(self) -> int:
+        return hash((self.rows, self.columns, self._hashes()[0]))
+
+    def canonical_hash(self) -> int:
+        """Returns a hash of the arrangement of queens on the chessboard
+        that is the same for every rotation or reflection of it (or, on a
+        board that isn't square, every rotation or reflection that leaves the
+        board's dimensions unchanged).  Boards that aren't symmetric to each
+        other can share a canonical hash, but only very rarely, which is why
+        a TranspositionTable doesn't rely on it alone."""
+        return hash((self.rows, self.columns, min(self._hashes())))
+
+    def _hashes(self) -> list[int]:
+        """Returns, for each of the board's symmetries, the hash of the
+        queens after applying that symmetry to them.
+
+        Each hash is the sum of a hash of each queen's cell, so a state whose
+        hashes have been computed passes them on to the states derived from
+        it, which update them only for the queens being added or removed."""
+        if self._symmetry_hashes is None:
+            hashes = [0] * len(_symmetries(self.rows, self.columns))
+            for code in self._codes():
+                for symmetry, cell_hash in enumerate(_cell_hashes(
+                        *_cell(code, self.rows, self.columns),
+                        self.rows, self.columns)):
+                    hashes[symmetry] += cell_hash
+            self._symmetry_hashes = [
+                symmetry_hash & _HASH_MASK for symmetry_hash in hashes]
+        return self._symmetry_hashes
+
+    def _rehash(self, position: Position, sign: int) -> None:
+        """Updates this state's symmetry hashes, if they've been computed,
+        for a queen that's been added to (if the sign is 1) or removed from
+        (if the sign is -1) the given position."""
+        if self._symmetry_hashes is not None:
+            self._symmetry_hashes = [
+                (symmetry_hash + sign * cell_hash) & _HASH_MASK
+                for symmetry_hash, cell_hash in zip(
+                    self._symmetry_hashes,
+                    _cell_hashes(*position, self.rows, self.columns))]
+
+    def to_bytes(self) -> bytes:
+        """Returns a compact snapshot of this state, from which from_bytes()
+        can rebuild it.  The queens are recorded in row-major order, so the
+        rebuilt state is equal to this one, though its queen_position may
+        list the queens in a different order."""
+        return _snapshot(self)
+
+    @classmethod
+    def from_bytes(cls, data) -> Self:
+        """Rebuilds a QueensState from a snapshot made by to_bytes(), given
+        as any object supporting the buffer protocol (such as bytes or an
+        mmap).  Raises a ValueError if the data is not exactly one valid
+        snapshot."""
+        view = memoryview(data).cast('B')
+        state, offset = _read_snapshot(view, 0)
+        if offset != len(view):
+            raise ValueError('unexpected data after the snapshot')
+        return state
+
+
+class TranspositionTable:
+    """Associates values with QueensStates, treating every rotation or
+    reflection of a state as the same state, so that a search can recognize
+    boards it has already explored in another orientation."""
+
+    def __init__(self):
+        """Initializes the table to be empty."""
+        # Each canonical hash leads to a list of entries, each a state's
+        # canonical form and its value, so that states whose hashes collide
+        # are still told apart.
+        self._entries = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, state: QueensState) -> bool:
+        return self._find(state)[1] is not None
+
+    def __getitem__(self, state: QueensState):
+        bucket, index = self._find(state)
+        if index is None:
+            raise KeyError(state)
+        return bucket[index][1]
+
+    def __setitem__(self, state: QueensState, value) -> None:
+        bucket, index = self._find(state)
+        if index is None:
+            self._insert(state, value)
+        else:
+            bucket[index] = (bucket[index][0], value)
+
+    def get(self, state: QueensState, default=None):
+        """Returns the value associated with the given state or any of its
+        rotations or reflections, or the default if there is none."""
+        bucket, index = self._find(state)
+        return default if index is None else bucket[index][1]
+
+    def add(self, state: QueensState, value=None) -> bool:
+        """Associates the given value with the given state, unless the state
+        or one of its rotations or reflections is already in the table.
+        Returns True if the state was added, or False if it was already
+        present, which makes it easy to skip symmetric duplicates."""
+        if self._find(state)[1] is not None:
+            return False
+        self._insert(state, value)
+        return True
+
+    def _find(self, state: QueensState) -> tuple:
+        """Returns the list of entries for the given state's canonical hash
+        (or None if there are none), and the index in it of the state's own
+        entry (or None if it has none).  The state's canonical form is only
+        computed when some entry shares its hash."""
+        bucket = self._entries.get(state.canonical_hash())
+        if bucket is None:
+            return None, None
+        form = _canonical_form(state)
+        for index, (entry_form, _) in enumerate(bucket):
+            if entry_form == form:
+                return bucket, index
+        return bucket, None
+
+    def _insert(self, state: QueensState, value) -> None:
+        """Adds an entry for a state that isn't in the table."""
+        self._entries.setdefault(state.canonical_hash(), []).append(
+            (_canonical_form(state), value))
+        self._size += 1
+
+
+def _canonical_form(state: QueensState) -> tuple:
+    """Returns the dimensions of the given state's board and the smallest of
+    the sorted tuples of its queens' codes after applying each of the board's
+    symmetries, which is the same for states exactly when they're rotations
+    or reflections of each other."""
+    rows, columns = state.rows, state.columns
+    cells = [_cell(code, rows, columns) for code in state._codes()]
+    return rows, columns, min(
+        tuple(sorted(
+            _cell_code(*symmetry(row, column, rows, columns), rows, columns)
+            for row, column in cells))
+        for symmetry in _symmetries(rows, columns))
+
+
+# The symmetries of a board, each a function that takes a cell's row and
+# column and the board's dimensions, and returns the cell's row and column
+# after the board is rotated or reflected.  The first four apply to every
+# board; the other four, which swap rows with columns, only to square ones.
+_SYMMETRIES = (
+    lambda row, column, rows, columns: (row, column),
+    lambda row, column, rows, columns: (rows - 1 - row, column),
+    lambda row, column, rows, columns: (row, columns - 1 - column),
+    lambda row, column, rows, columns: (rows - 1 - row, columns - 1 - column),
+    lambda row, column, rows, columns: (column, row),
+    lambda row, column, rows, columns: (column, rows - 1 - row),
+    lambda row, column, rows, columns: (columns - 1 - column, row),
+    lambda row, column, rows, columns: (
+        columns - 1 - column, rows - 1 - row))
+
+_HASH_MASK = (1 << 64) - 1
+
+
+def _symmetries(rows: int, columns: int) -> tuple:
+    """Returns the symmetries of a board with the given dimensions."""
+    return _SYMMETRIES if rows == columns else _SYMMETRIES[:4]
+
+
+def _cell_hashes(
+        row: int, column: int, rows: int, columns: int) -> list[int]:
+    """Returns the hash of the given cell after applying each of the
+    board's symmetries to it."""
+    return [_mix(transformed_row * columns + transformed_column)
+            for transformed_row, transformed_column in (
+                symmetry(row, column, rows, columns)
+                for symmetry in _symmetries(rows, columns))]
+
+
+def _mix(value: int) -> int:
+    """Scrambles the given integer into a 64-bit hash (using the
+    finalizer of the SplitMix64 generator), so that the sum of the hashes
+    of a few cells says little about which cells they were."""
+    value = (value + 0x9E3779B97F4A7C15) & _HASH_MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _HASH_MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _HASH_MASK
+    return value ^ (value >> 31)
+
+
+def _cell_code(row: int, column: int, rows: int, columns: int) -> int:
+    """Returns the code for the cell in the given row and column of a board
+    with the given dimensions, whether or not it's on the board."""
+    if 0 <= row < rows and 0 <= column < columns:
+        return row * columns + column
+    return _off_board_code(row, column, rows, columns)
+
+
+def _off_board_code(row: int, column: int, rows: int, columns: int) -> int:
+    """Returns the code for a position that isn't on a board with the given
+    dimensions.  The row and column are each mapped to a non-negative integer
+    (0, -1, 1, -2, 2, ... going to 0, 1, 2, 3, 4, ...), the pair of those is
+    mapped to a single one as Szudzik's pairing function does, and the
+    result follows the codes of the board's cells.  A code must still fit in
+    64 bits, so a position can be off the board by about 2 ** 31 at most."""
+    first = 2 * row if row >= 0 else -2 * row - 1
+    second = 2 * column if column >= 0 else -2 * column - 1
+    if first >= second:
+        pair = first * first + first + second
+    else:
+        pair = second * second + first
+    return rows * columns + pair
+
+
+def _cell(code: int, rows: int, columns: int) -> tuple[int, int]:
+    """Returns the row and column with the given code
+    on a board with the given dimensions."""
+    cells = rows * columns
+    if code < cells:
+        return divmod(code, columns)
+    pair = code - cells
+    root = math.isqrt(pair)
+    rest = pair - root * root
+    if rest < root:
+        first, second = rest, root
+    else:
+        first, second = root, rest - root
+    return (first // 2 if first % 2 == 0 else -(first + 1) // 2,
+            second // 2 if second % 2 == 0 else -(second + 1) // 2)
+
+
+def _lines(row: int, column: int) -> tuple[int, int, int, int]:
+    """Returns the row, column, diagonal and anti-diagonal
+    that pass through the given cell."""
+    return row, column, row - column, row + column
+
+
+# The smallest batch of queens that with_queens_added() will add in bulk,
+# rather than one at a time, when the batch is also at least half as large as
+# the number of queens already on the board.
+_BULK_ADD_THRESHOLD = 32
+
+# The kinds of lines, in the order _lines() returns them.
+_ROW, _COLUMN, _DIAGONAL, _ANTI_DIAGONAL = range(4)
+
+# The set of queens in a line that no queens occupy.
+_NO_QUEENS = PersistentMap()
+
+
+def _mask(bits: Iterable[int]) -> int:
+    """Returns the integer whose set bits are the given ones.  It's built
+    as bytes, since setting the bits of a large integer one at a time would
+    copy the whole integer each time."""
+    mask = bytearray()
+    for bit in bits:
+        byte = bit >> 3
+        if byte >= len(mask):
+            mask.extend(bytes(byte + 1 - len(mask)))
+        mask[byte] |= 1 << (bit & 7)
+    return int.from_bytes(mask, 'little')
+
+
+# Solving the n-queens problem
+#
+# A solution places as many mutually safe queens as the board's shorter
+# dimension allows: one queen on each row of a board that is at least as wide
+# as it is tall, or one on each column of a board that is taller than it is
+# wide.  The strategies below all work in terms of "lines" (the board's
+# shorter dimension) and "width" (its longer one), returning a list holding
+# the chosen cell along the width for each line, or None if there isn't one.
+
+
+def solve(
+        rows: int, columns: int, strategy: str | Callable = 'auto',
+        **options) -> QueensState | None:
+    """Returns a QueensState holding a solution to the n-queens problem on a
+    board with the given numbers of rows and columns, or None if the board
+    has no solution.  'min_conflicts' can also return None when it runs out
+    of steps without finding one, whether or not there is one.
+
+    The strategy is either the name of one of the built-in strategies or a
+    function that takes the numbers of lines and the width, along with any
+    given options, and returns the chosen cell for each line.  The built-in
+    strategies are:
+
+    * 'backtracking', an exhaustive search using bitmasks, which is best on
+      small boards and is the only one that can show there's no solution.
+    * 'min_conflicts', a local search that repeatedly swaps the columns of
+      queens under attack to reduce the attacks on them, which accepts
+      'seed' and 'max_steps' options.
+    * 'constructive', a closed-form placement that takes linear time,
+      which searches by backtracking on the boards with two or three lines
+      that the placement doesn't cover.
+    * 'auto', which is the same as 'constructive'."""
+    lines, width = min(rows, columns), max(rows, columns)
+    if isinstance(strategy, str):
+        if strategy not in _STRATEGIES:
+            raise ValueError(f'unknown strategy {strategy!r}')
+        strategy = _STRATEGIES[strategy]
+
+    return _solution(rows, columns, strategy(lines, width, **options))
+
+
+def _solution(
+        rows: int, columns: int,
+        cells: list[int] | None) -> QueensState | None:
+    """Returns a QueensState holding the queens in the given cells, one for
+    each line of a board with the given numbers of rows and columns, or None
+    if there are no cells.  Raises a ValueError if there isn't exactly one
+    cell for each line, or a cell isn't on the board."""
+    if cells is None:
+        return None
+    lines, width = min(rows, columns), max(rows, columns)
+    if len(cells) != lines:
+        raise ValueError(
+            f'expected {lines} cells, one for each line, but got {len(cells)}')
+    for line, cell in enumerate(cells):
+        if not 0 <= cell < width:
+            raise ValueError(
+                f'cell {cell} for line {line} is not on the chessboard')
+    if rows <= columns:
+        codes = array('Q', (line * columns + cell
+                            for line, cell in enumerate(cells)))
+    else:
+        codes = array('Q', (cell * columns + line
+                            for line, cell in enumerate(cells)))
+
+    solution = QueensState(rows, columns)
+    solution._set_codes(codes)
+    # the queens in a solution are safe, so there's no need to index them
+    # to find that out
+    solution._conflicts = 0
+    return solution
+
+
+def _solve_by_backtracking(lines: int, width: int) -> list[int] | None:
+    """Searches for a solution depth-first, as _search does."""
+    solution = next(_search(width, [-1] * lines), None)
+    return None if solution is None else list(solution)
+
+
+def _search(
+        width: int, cells: list[int],
+        after: tuple[int, ...] | None = None,
+        pause_every: int | None = None) -> Iterator[tuple[int, ...] | None]:
+    """Generates the solutions in which each line holds the given cell (or
+    any cell, if it's -1), in lexicographic order, starting with the first
+    one after the given solution if there is one.  Raises a ValueError if
+    that isn't one of the solutions.  If pause_every is given, None is also
+    generated each time that many more queens have been placed, giving the
+    caller a chance to do something else before the search continues.
+
+    The search is depth-first, keeping the cells attacked along the current
+    line as bitmasks of columns, diagonals and anti-diagonals, so it uses
+    memory proportional only to the number of lines."""
+    lines = len(cells)
+    if lines == 0:
+        if after is None:
+            yield ()
+        elif after != ():
+            raise ValueError(f'{after} is not a solution')
+        return
+
+    full = (1 << width) - 1
+    attacked = [(0, 0, 0)] * lines
+    available = [0] * lines
+    chosen = [0] * lines
+
+    def restrict(line: int, cells_available: int) -> int:
+        if cells[line] == -1:
+            return cells_available
+        return cells_available & (1 << cells[line])
+
+    def place(line: int, bit: int) -> None:
+        chosen[line] = bit
+        if line < lines - 1:
+            columns, diagonals, anti_diagonals = attacked[line]
+            columns |= bit
+            diagonals = ((diagonals | bit) << 1) & full
+            anti_diagonals = (anti_diagonals | bit) >> 1
+            attacked[line + 1] = columns, diagonals, anti_diagonals
+            available[line + 1] = restrict(line + 1, full & ~(
+                columns | diagonals | anti_diagonals))
+
+    available[0] = restrict(0, full)
+    line = 0
+    if after is not None:
+        # Retrace the path to the given solution, leaving each line with
+        # only the cells after the one the solution chose.
+        if len(after) != lines:
+            raise ValueError(f'{after} is not a solution')
+        for line, cell in enumerate(after):
+            bit = 1 << cell if 0 <= cell < width else 0
+            if not available[line] & bit:
+                raise ValueError(f'{after} is not a solution')
+            available[line] &= ~((bit << 1) - 1)
+            place(line, bit)
+
+    placed = 0
+    while line >= 0:
+        if not available[line]:
+            line -= 1
+            continue
+        bit = available[line] & -available[line]
+        available[line] ^= bit
+        place(line, bit)
+        if pause_every is not None:
+            placed += 1
+            if placed == pause_every:
+                placed = 0
+                yield None
+        if line == lines - 1:
+            yield tuple(bit.bit_length() - 1 for bit in chosen)
+        else:
+            line += 1
+
+
+def _solve_by_min_conflicts(
+        lines: int, width: int, *, seed: int | None = None,
+        max_steps: int | None = None) -> list[int] | None:
+    """Searches for a solution by local search, starting from queens in
+    randomly chosen distinct columns, then repeatedly picking a queen under
+    attack and swapping its column with another queen's (or with an empty
+    column) whenever that leaves the two of them under fewer attacks.  Since
+    columns are only ever swapped, no two queens ever share one, so only the
+    diagonals need watching.  The search starts over if it gets stuck, and
+    gives up, returning None, after the given number of steps."""
+    rng = random.Random(seed)
+    if max_steps is None:
+        max_steps = 1000 * lines + 1000
+    if lines == 0:
+        return []
+    diagonal_counts = [0] * (lines + width)
+    anti_diagonal_counts = [0] * (lines + width)
+
+    # The most recent line to place a queen on each diagonal and anti-diagonal,
+    # which lets a queen that moves into a cell under attack find (most of)
+    # its attackers without a search.
+    diagonal_lines = [0] * (lines + width)
+    anti_diagonal_lines = [0] * (lines + width)
+
+    def attacks(line: int, cell: int) -> int:
+        return (diagonal_counts[line - cell + width]
+                + anti_diagonal_counts[line + cell])
+
+    def remove(line: int, cell: int) -> None:
+        diagonal_counts[line - cell + width] -= 1
+        anti_diagonal_counts[line + cell] -= 1
+
+    def place(line: int, cell: int) -> None:
+        cells[line] = cell
+        diagonal_counts[line - cell + width] += 1
+        anti_diagonal_counts[line + cell] += 1
+        diagonal_lines[line - cell + width] = line
+        anti_diagonal_lines[line + cell] = line
+
+    def attackers(line: int) -> list[int]:
+        cell = cells[line]
+        return [diagonal_lines[line - cell + width],
+                anti_diagonal_lines[line + cell]]
+
+    steps = 0
+    while steps < max_steps:
+        spare_cells = list(range(width))
+        rng.shuffle(spare_cells)
+        cells = spare_cells[:lines]
+        del spare_cells[:lines]
+        diagonal_counts[:] = [0] * (lines + width)
+        anti_diagonal_counts[:] = [0] * (lines + width)
+        for line, cell in enumerate(cells):
+            place(line, cell)
+
+        restart_at = min(max_steps, steps + _MIN_CONFLICTS_RESTART * lines)
+        while steps < restart_at:
+            # A queen counts itself once on each of its two diagonals.
+            unsafe = [line for line in range(lines)
+                      if attacks(line, cells[line]) > 2]
+            if not unsafe:
+                return cells
+            while unsafe and steps < restart_at:
+                steps += 1
+                index = int(rng.random() * len(unsafe))
+                line = unsafe[index]
+                cell = cells[line]
+                if attacks(line, cell) == 2:
+                    unsafe[index] = unsafe[-1]
+                    unsafe.pop()
+                    continue
+
+                partner = int(rng.random() * (lines + len(spare_cells)))
+                if partner == line:
+                    continue
+                if partner < lines:
+                    partner_cell = cells[partner]
+                    before = (attacks(line, cell)
+                              + attacks(partner, partner_cell))
+                    remove(line, cell)
+                    remove(partner, partner_cell)
+                    place(line, partner_cell)
+                    place(partner, cell)
+                    after = (attacks(line, partner_cell)
+                             + attacks(partner, cell))
+                    if after < before:
+                        unsafe.extend(attackers(line) + attackers(partner))
+                    else:
+                        remove(line, partner_cell)
+                        remove(partner, cell)
+                        place(line, cell)
+                        place(partner, partner_cell)
+                else:
+                    spare = partner - lines
+                    spare_cell = spare_cells[spare]
+                    before = attacks(line, cell)
+                    remove(line, cell)
+                    place(line, spare_cell)
+                    if attacks(line, spare_cell) < before:
+                        spare_cells[spare] = cell
+                        unsafe.extend(attackers(line))
+                    else:
+                        remove(line, spare_cell)
+                        place(line, cell)
+    return None
+
+
+def _solve_by_construction(lines: int, width: int) -> list[int] | None:
+    """Builds a solution using the well-known explicit placement for n
+    queens on an n-by-n board, which exists for every n other than 2 and 3
+    and remains a solution when the board is wider than it is tall.  Boards
+    with those two numbers of lines are small enough to search instead,
+    which finds the solutions that the wider ones have."""
+    if lines in (2, 3):
+        return _solve_by_backtracking(lines, width)
+    evens = list(range(1, lines, 2))
+    odds = list(range(0, lines, 2))
+    if lines % 6 == 2:
+        odds[0], odds[1] = odds[1], odds[0]
+        odds.append(odds.pop(2))
+    elif lines % 6 == 3:
+        evens.append(evens.pop(0))
+        odds.append(odds.pop(0))
+        odds.append(odds.pop(0))
+    return evens + odds
+
+
+_MIN_CONFLICTS_RESTART = 20
+
+_STRATEGIES = {
+    'auto': _solve_by_construction,
+    'backtracking': _solve_by_backtracking,
+    'min_conflicts': _solve_by_min_conflicts,
+    'constructive': _solve_by_construction}
+
+
+# Counting solutions
+#
+# Counting every solution means searching the whole tree of placements, so
+# the tree is split into subtrees by the cells chosen on the first two lines
+# still free, and the subtrees are counted in parallel by a pool of processes.
+# Each idle process takes the next subtree as soon as it finishes its last
+# one, so a process that draws small subtrees simply counts more of them.
+
+SolutionCount = namedtuple('SolutionCount', ['total', 'workers'])
+SolutionCount.__doc__ = (
+    'The result of counting the solutions that complete a QueensState.')
+SolutionCount.total.__doc__ = 'The number of solutions'
+SolutionCount.workers.__doc__ = (
+    'A dictionary mapping the ID of each process that counted solutions '
+    'to its WorkerThroughput')
+
+WorkerThroughput = namedtuple(
+    'WorkerThroughput', ['subtrees', 'nodes', 'seconds'])
+WorkerThroughput.__doc__ = 'How much of a search one process performed.'
+WorkerThroughput.subtrees.__doc__ = (
+    'The number of subtrees the process searched')
+WorkerThroughput.nodes.__doc__ = 'The number of placements the process tried'
+WorkerThroughput.seconds.__doc__ = (
+    'The time the process spent searching, in seconds')
+
+
+def count_solutions(
+        state: QueensState, processes: int | None = None) -> SolutionCount:
+    """Counts the solutions that can be reached by adding queens to the
+    given state, using the given number of processes (or one per CPU, if
+    it's None).  A solution is as described for solve(): one queen on each
+    line of the board's shorter dimension, with no queen attacking another.
+
+    When the state's queens are arranged symmetrically (including when there
+    are none at all), only the solutions whose first added queen lies on the
+    left half of its line are searched, since each has a mirror image."""
+    lines, width, cells = _line_cells(state)
+    if cells is None:
+        return SolutionCount(0, {})
+    tasks = _split_search(width, cells)
+
+    if processes == 1:
+        results = map(_count_subtree, tasks)
+        return _tally(results)
+    with multiprocessing.Pool(processes) as pool:
+        return _tally(pool.imap_unordered(_count_subtree, tasks, chunksize=1))
+
+
+def _line_cells(state: QueensState) -> tuple[int, int, list[int] | None]:
+    """Describes the given state in terms of lines, as solve() does, returning
+    the number of lines, the width, and the cell occupied on each line (or -1
+    if the line is empty).  The cells are None instead if the state's queens
+    could never be part of a solution."""
+    lines = min(state.rows, state.columns)
+    width = max(state.rows, state.columns)
+    cells = [-1] * lines
+    for queen in state.queens():
+        line, cell = queen if state.rows <= state.columns else queen[::-1]
+        if not (0 <= line < lines and 0 <= cell < width) or cells[line] != -1:
+            return lines, width, None
+        cells[line] = cell
+    if state.any_queens_unsafe():
+        return lines, width, None
+    return lines, width, cells
+
+
+def _split_search(width: int, cells: list[int]) -> list[tuple]:
+    """Splits the search for solutions into tasks, one for each way of
+    placing queens on the first two empty lines.  Each task is a tuple of the
+    width, the cells occupied on each line once those queens are placed, and
+    how many solutions each solution found in that subtree stands for."""
+    free_lines = [line for line, cell in enumerate(cells) if cell == -1]
+    symmetric = cells == [
+        width - 1 - cell if cell != -1 else -1 for cell in cells]
+    tasks = [(cells, 1, symmetric)]
+
+    for line in free_lines[:2]:
+        split_tasks = []
+        for task_cells, weight, symmetric in tasks:
+            for cell in range(width):
+                split_cells = list(task_cells)
+                split_cells[line] = cell
+                if not symmetric:
+                    split_tasks.append((split_cells, weight, False))
+                elif 2 * cell + 1 < width:
+                    split_tasks.append((split_cells, weight * 2, False))
+                elif 2 * cell + 1 == width:
+                    # A queen in the very middle of its line leaves the
+                    # board as symmetric as it was.
+                    split_tasks.append((split_cells, weight, True))
+        tasks = split_tasks
+
+    return [(width, tuple(task_cells), weight)
+            for task_cells, weight, _ in tasks]
+
+
+def _count_subtree(task: tuple) -> tuple[int, int, float, int]:
+    """Counts the solutions in one task's subtree of the search, returning
+    the count (weighted as the task says), the number of placements tried,
+    the time taken and the ID of the process that counted them."""
+    width, cells, weight = task
+    start = time.perf_counter()
+    count, nodes = _count_completions(width, cells)
+    return (count * weight, nodes, time.perf_counter() - start, os.getpid())
+
+
+def _count_completions(width: int, cells: tuple[int, ...]) -> tuple[int, int]:
+    """Counts the solutions in which each line holds the given cell (or any
+    cell, if it's -1), returning the count and the number of placements
+    tried.  The search is depth-first, using bitmasks like
+    _solve_by_backtracking."""
+    lines = len(cells)
+    full = (1 << width) - 1
+    nodes = 0
+
+    def count_from(line: int, columns: int, diagonals: int,
+                   anti_diagonals: int) -> int:
+        nonlocal nodes
+        if line == lines:
+            return 1
+        available = full & ~(columns | diagonals | anti_diagonals)
+        if cells[line] != -1:
+            available &= 1 << cells[line]
+        count = 0
+        while available:
+            bit = available & -available
+            available ^= bit
+            nodes += 1
+            count += count_from(
+                line + 1, columns | bit, ((diagonals | bit) << 1) & full,
+                (anti_diagonals | bit) >> 1)
+        return count
+
+    return count_from(0, 0, 0, 0), nodes
+
+
+def _tally(results) -> SolutionCount:
+    """Totals the results of counting subtrees, per process and overall."""
+    total = 0
+    workers = {}
+    for count, nodes, seconds, worker in results:
+        total += count
+        subtrees, worker_nodes, worker_seconds = workers.get(
+            worker, (0, 0, 0.0))
+        workers[worker] = WorkerThroughput(
+            subtrees + 1, worker_nodes + nodes, worker_seconds + seconds)
+    return SolutionCount(total, workers)
+
+
+# Streaming solutions
+
+
+def iter_solutions(
+        state: QueensState,
+        after: tuple[int, ...] | None = None) -> Iterator[tuple[int, ...]]:
+    """Generates the solutions that can be reached by adding queens to the
+    given state, lazily and using memory that doesn't grow as more are
+    generated.  A solution is as described for solve().
+
+    Each solution is a tuple holding the column of the queen on each row,
+    or, for a board that is taller than it is wide, the row of the queen on
+    each column.  Solutions are generated in increasing order, so the last
+    one received serves as a checkpoint: passing it as 'after' resumes with
+    the solution that follows it.  Raises a ValueError if 'after' isn't one
+    of the solutions."""
+    _, width, cells = _line_cells(state)
+    if cells is None:
+        if after is not None:
+            raise ValueError(f'{after} is not a solution')
+        return iter(())
+    return _search(width, cells, after)
+
+
+# Solving without blocking an event loop
+#
+# An exhaustive search can run for a long time, so solve_async() pauses it
+# every so often to let the event loop run other tasks, which also gives the
+# loop a chance to cancel it.  It can instead hand the search to an executor,
+# one subtree (the placements that start with a particular cell on the first
+# line) at a time, and wait for whichever subtree finds a solution first.
+
+async def solve_async(
+        rows: int, columns: int, *, timeout: float | None = None,
+        executor: concurrent.futures.Executor | None = None,
+        pause_every: int = 10_000) -> QueensState | None:
+    """Returns a QueensState holding a solution to the n-queens problem on a
+    board with the given numbers of rows and columns, or None if the board
+    has no solution, searching exhaustively like solve(rows, columns,
+    'backtracking') without blocking the event loop.
+
+    Without an executor, the search runs in the event loop's thread, pausing
+    every pause_every queens it places.  With one (such as a
+    concurrent.futures.ProcessPoolExecutor), each subtree of the search is
+    submitted to it, and the solution is whichever is found first, so it
+    isn't necessarily the one solve() would find.
+
+    Raises a TimeoutError if no answer is found within the given number of
+    seconds.  If the task running this coroutine is cancelled or times out,
+    subtrees not yet started in the executor are cancelled, though subtrees
+    already running there run to completion."""
+    async with asyncio.timeout(timeout):
+        lines, width = min(rows, columns), max(rows, columns)
+        if executor is None or lines == 0:
+            for cells in _search(width, [-1] * lines, pause_every=pause_every):
+                if cells is not None:
+                    return _solution(rows, columns, list(cells))
+                await asyncio.sleep(0)
+            return None
+        return _solution(
+            rows, columns, await _solve_subtrees(lines, width, executor))
+
+
+async def _solve_subtrees(
+        lines: int, width: int,
+        executor: concurrent.futures.Executor) -> list[int] | None:
+    """Solves each subtree of the search in the given executor, returning
+    the first solution found or None if no subtree has one."""
+    loop = asyncio.get_running_loop()
+    pending = {
+        loop.run_in_executor(executor, _solve_subtree, lines, width, cell)
+        for cell in range(width)}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if future.result() is not None:
+                    return future.result()
+        return None
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _solve_subtree(lines: int, width: int, cell: int) -> list[int] | None:
+    """Returns the first solution that places a queen in the given cell on
+    the first line, or None if there isn't one."""
+    solution = next(_search(width, [cell] + [-1] * (lines - 1)), None)
+    return None if solution is None else list(solution)
+
+
+# Checking many boards at once
+
+
+def any_queens_unsafe_in_batch(boards) -> Sequence[bool]:
+    """Returns, for each of the given boards, whether any of its queens are
+    unsafe, as any_queens_unsafe() would.  The boards are either an iterable
+    whose boards are QueensStates or sequences of (row, column) pairs, or an
+    array of shape (N, k, 2) holding the row and column of each of k queens
+    on each of N boards.
+
+    When NumPy is installed, the boards are checked all at once -- by
+    sorting each board's rows, columns, diagonals and anti-diagonals and
+    looking for repeats -- and the result is a NumPy array of booleans that
+    can be used as a mask.  Otherwise, the boards are checked one at a time
+    and the result is a list."""
+    if numpy is None:
+        return _any_queens_unsafe_in_batch_slowly(boards)
+
+    if isinstance(boards, numpy.ndarray):
+        coordinates = boards.astype(numpy.int64)
+        if coordinates.ndim != 3 or coordinates.shape[2] != 2:
+            raise ValueError('boards must have shape (N, k, 2)')
+        board_count, queens_per_board, _ = coordinates.shape
+        board_ids = numpy.repeat(
+            numpy.arange(board_count, dtype=numpy.int64), queens_per_board)
+        rows = coordinates[:, :, 0].ravel()
+        columns = coordinates[:, :, 1].ravel()
+    else:
+        board_lines = [_board_lines(board) for board in boards]
+        board_count = len(board_lines)
+        counts = numpy.array(
+            [len(board_rows) for board_rows, _ in board_lines],
+            dtype=numpy.int64)
+        board_ids = numpy.repeat(
+            numpy.arange(board_count, dtype=numpy.int64), counts)
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        rows = numpy.concatenate(
+            [empty] + [board_rows for board_rows, _ in board_lines])
+        columns = numpy.concatenate(
+            [empty] + [board_columns for _, board_columns in board_lines])
+
+    unsafe = numpy.zeros(board_count, dtype=bool)
+    if not len(board_ids):
+        return unsafe
+    for lines in (rows, columns, rows - columns, rows + columns):
+        # Combine each queen's board and line into a single key, so that
+        # two queens share a line on the same board exactly when they
+        # share a key.
+        lowest = lines.min()
+        span = int(lines.max() - lowest) + 1
+        keys = numpy.sort(board_ids * span + (lines - lowest))
+        repeated = keys[1:][keys[1:] == keys[:-1]]
+        unsafe[repeated // span] = True
+    return unsafe
+
+
+def _board_lines(board) -> tuple:
+    """Returns NumPy arrays of the rows and the columns of the queens on the
+    given board, which is a QueensState or a sequence of (row, column)
+    pairs."""
+    if isinstance(board, QueensState):
+        codes = numpy.frombuffer(board._codes(), dtype=numpy.uint64)
+        if codes.size and codes.max() >= board.rows * board.columns:
+            # some queens are off the board, so their codes aren't simply
+            # row-major
+            cells = [_cell(code, board.rows, board.columns)
+                     for code in board._codes()]
+            return (numpy.array([row for row, _ in cells], dtype=numpy.int64),
+                    numpy.array([column for _, column in cells],
+                                dtype=numpy.int64))
+        return numpy.divmod(codes.astype(numpy.int64), board.columns)
+    coordinates = numpy.asarray(board, dtype=numpy.int64)
+    if coordinates.size == 0:
+        coordinates = coordinates.reshape(0, 2)
+    if coordinates.ndim != 2 or coordinates.shape[1] != 2:
+        raise ValueError('each board must hold (row, column) pairs')
+    return coordinates[:, 0], coordinates[:, 1]
+
+
+def _any_queens_unsafe_in_batch_slowly(boards) -> list[bool]:
+    """Returns, for each of the given boards, whether any of its queens are
+    unsafe, checking the boards one at a time."""
+    unsafe = []
+    for board in boards:
+        if isinstance(board, QueensState):
+            unsafe.append(board.any_queens_unsafe())
+        else:
+            seen = (set(), set(), set(), set())
+            board_unsafe = False
+            for row, column in board:
+                for kind, line in enumerate(_lines(row, column)):
+                    if line in seen[kind]:
+                        board_unsafe = True
+                    seen[kind].add(line)
+            unsafe.append(board_unsafe)
+    return unsafe
+
+
+# Snapshots
+#
+# A snapshot records a QueensState in a few bytes: a two-byte magic number,
+# a byte saying how the queens are encoded, then the board's rows, columns
+# and number of queens as varints (seven bits per byte, least significant
+# first, with the high bit set on every byte but the last).  The queens
+# follow either as varints of the gaps between the codes of consecutive
+# queens in row-major order (with any queens off the board last), or, when
+# it would be shorter and every queen is on the board, as a bitmap with one
+# bit per cell.  Snapshots can be written one after another to a file,
+# then read back without copying the file by mapping it into memory.
+
+_SNAPSHOT_MAGIC = b'Q1'
+_GAPS = 0
+_BITMAP = 1
+
+
+def write_snapshots(states: Iterable[QueensState], file) -> int:
+    """Writes a snapshot of each of the given states to the given binary
+    file, one after another, returning the number of bytes written."""
+    written = 0
+    for state in states:
+        written += file.write(_snapshot(state))
+    return written
+
+
+def read_snapshots(data) -> Iterator[QueensState]:
+    """Generates the states whose snapshots were written, one after another,
+    into the given data, which may be any object supporting the buffer
+    protocol.  Passing an mmap of a file of snapshots reads them straight
+    from the file, a state at a time.  Raises a ValueError if the data
+    isn't a sequence of valid snapshots."""
+    view = memoryview(data).cast('B')
+    offset = 0
+    while offset < len(view):
+        state, offset = _read_snapshot(view, offset)
+        yield state
+
+
+def _snapshot(state: QueensState) -> bytes:
+    """Returns the snapshot of the given state."""
+    codes = sorted(state._codes())
+    gaps = bytearray()
+    previous = -1
+    for code in codes:
+        _write_varint(gaps, code - previous - 1)
+        previous = code
+    cells = state.rows * state.columns
+    bitmap_size = (cells + 7) // 8
+    header = bytearray(_SNAPSHOT_MAGIC)
+    if bitmap_size < len(gaps) and codes[-1] < cells:
+        header.append(_BITMAP)
+        payload = _mask(codes).to_bytes(bitmap_size, 'little')
+    else:
+        header.append(_GAPS)
+        payload = gaps
+    for value in (state.rows, state.columns, len(codes)):
+        _write_varint(header, value)
+    return bytes(header + payload)
+
+
+def _read_snapshot(view: memoryview, offset: int) -> tuple[QueensState, int]:
+    """Reads the snapshot starting at the given offset in the given view,
+    returning the state it records and the offset just past it."""
+    if bytes(view[offset:offset + 2]) != _SNAPSHOT_MAGIC:
+        raise ValueError(f'no snapshot at offset {offset}')
+    if offset + 2 >= len(view):
+        raise ValueError('snapshot is truncated')
+    encoding = view[offset + 2]
+    rows, offset = _read_varint(view, offset + 3)
+    columns, offset = _read_varint(view, offset)
+    count, offset = _read_varint(view, offset)
+    cells = rows * columns
+    codes = array('Q')
+    if encoding == _GAPS:
+        code = -1
+        for _ in range(count):
+            gap, offset = _read_varint(view, offset)
+            code += gap + 1
+            codes.append(code)
+    elif encoding == _BITMAP:
+        size = (cells + 7) // 8
+        if offset + size > len(view):
+            raise ValueError('snapshot is truncated')
+        bits = bin(int.from_bytes(view[offset:offset + size], 'little'))
+        bits = bits[:1:-1]
+        code = bits.find('1')
+        while code != -1:
+            codes.append(code)
+            code = bits.find('1', code + 1)
+        offset += size
+    else:
+        raise ValueError(f'unknown snapshot encoding {encoding}')
+    if len(codes) != count or (
+            encoding == _BITMAP and codes and codes[-1] >= cells):
+        raise ValueError('snapshot queens do not fit its board')
+    state = QueensState.__new__(QueensState)
+    state.rows = rows
+    state.columns = columns
+    state._replace_codes(codes)
+    return state, offset
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    """Appends the given non-negative integer to the buffer as a varint."""
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(view: memoryview, offset: int) -> tuple[int, int]:
+    """Reads the varint starting at the given offset in the given view,
+    returning its value and the offset just past it."""
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(view):
+            raise ValueError('snapshot is truncated')
+        byte = view[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+# Profiling
+#
+# While profiling() is active, a few of QueensState's methods are replaced by
+# versions that count what they do; when it ends, the originals are put back.
+# Nothing is counted or checked the rest of the time, so QueensState runs
+# exactly as fast as it would if profiling didn't exist.  Since the methods
+# are replaced on the class, every QueensState in the process is profiled,
+# though not those in the worker processes used by count_solutions().
+
+class QueensProfile:
+    """The counts gathered by QueensStates while profiling() is active."""
+
+    def __init__(self):
+        """Initializes every count to zero."""
+        self.states_created = 0
+        self.positions_copied = 0
+        self.conflict_checks = 0
+        self.conflict_check_seconds = 0.0
+
+    def report(self) -> str:
+        """Returns a summary of the counts, one per line."""
+        average = (self.conflict_check_seconds / self.conflict_checks
+                   if self.conflict_checks else 0.0)
+        return '\n'.join([
+            f'states created:         {self.states_created}',
+            f'positions copied:       {self.positions_copied}',
+            f'conflict checks:        {self.conflict_checks}',
+            f'conflict check seconds: {self.conflict_check_seconds:.6f}',
+            f'seconds per check:      {average:.9f}'])
+
+
+@contextlib.contextmanager
+def profiling() -> Iterator[QueensProfile]:
+    """Counts, until the with statement that uses it ends, the QueensStates
+    created, the queen positions copied into new states or out of existing
+    ones, and the conflict checks performed along with the time they took.
+    The with statement's target is the QueensProfile holding the counts."""
+    profile = QueensProfile()
+    originals = {
+        name: QueensState.__dict__[name]
+        for name in ('_copy', '_replace_codes', 'queen_position',
+                     *_CONFLICT_CHECKS)}
+
+    @functools.wraps(originals['_copy'])
+    def copy(self):
+        profile.states_created += 1
+        return originals['_copy'](self)
+
+    # Every other new state is given its first queens by _replace_codes,
+    # which also replaces the queens of existing states.
+    @functools.wraps(originals['_replace_codes'])
+    def replace_codes(self, codes):
+        if not hasattr(self, '_queen_codes'):
+            profile.states_created += 1
+        profile.positions_copied += len(codes)
+        return originals['_replace_codes'](self, codes)
+
+    def queen_position(self):
+        positions = originals['queen_position'].fget(self)
+        profile.positions_copied += len(positions)
+        return positions
+
+    try:
+        QueensState._copy = copy
+        QueensState._replace_codes = replace_codes
+        QueensState.queen_position = property(
+            queen_position, originals['queen_position'].fset,
+            doc=originals['queen_position'].__doc__)
+        for name in _CONFLICT_CHECKS:
+            setattr(QueensState, name, _timed(originals[name], profile))
+        yield profile
+    finally:
+        for name, original in originals.items():
+            setattr(QueensState, name, original)
+
+
+# The methods whose calls profiling() counts as conflict checks.
+_CONFLICT_CHECKS = (
+    'any_queens_unsafe', 'is_attacked', 'attackers_of', 'safe_columns',
+    'first_conflict', 'conflicting_pairs')
+
+
+def _timed(method: Callable, profile: QueensProfile) -> Callable:
+    """Returns a version of the given method that counts its calls and the
+    time they take as conflict checks in the given profile."""
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile.conflict_checks += 1
+            profile.conflict_check_seconds += time.perf_counter() - start
+
+    return timed
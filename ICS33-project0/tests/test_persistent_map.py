@@ -0,0 +1,96 @@
+"""Testing module for persistent_map.py"""
+# ICS 33 Spring 2025
+# Project 0: History of Modern
+#
+# Unit tests for the PersistentMap class in "persistent_map.py".
+
+import unittest
+from persistent_map import PersistentMap
+
+
+class CollidingKey:
+    """A key whose hash collides with every other key of the same group,
+    used to exercise the map's handling of identical hashes."""
+    def __init__(self, group: int, name: str):
+        self.group = group
+        self.name = name
+
+    def __hash__(self):
+        return self.group
+
+    def __eq__(self, other):
+        return (isinstance(other, CollidingKey)
+                and (self.group, self.name) == (other.group, other.name))
+
+
+class TestPersistentMap(unittest.TestCase):
+    """Testing class for PersistentMap"""
+    def test_empty_map_has_no_keys(self):
+        """Testcase: a new map is empty"""
+        persistent_map = PersistentMap()
+        self.assertEqual(len(persistent_map), 0)
+        self.assertNotIn(1, persistent_map)
+        self.assertIsNone(persistent_map.get(1))
+
+    def test_set_adds_key_without_modifying_original(self):
+        """Testcase: set() returns a new map and leaves the original alone"""
+        persistent_map = PersistentMap()
+        new_map = persistent_map.set('a', 1)
+        self.assertEqual(new_map.get('a'), 1)
+        self.assertEqual(len(new_map), 1)
+        self.assertNotIn('a', persistent_map)
+
+    def test_set_replaces_existing_value(self):
+        """Testcase: setting an existing key replaces its value"""
+        persistent_map = PersistentMap().set('a', 1)
+        new_map = persistent_map.set('a', 2)
+        self.assertEqual(new_map.get('a'), 2)
+        self.assertEqual(len(new_map), 1)
+        self.assertEqual(persistent_map.get('a'), 1)
+
+    def test_delete_removes_key_without_modifying_original(self):
+        """Testcase: delete() returns a new map
+        and leaves the original alone"""
+        persistent_map = PersistentMap().set('a', 1).set('b', 2)
+        new_map = persistent_map.delete('a')
+        self.assertNotIn('a', new_map)
+        self.assertEqual(len(new_map), 1)
+        self.assertEqual(persistent_map.get('a'), 1)
+
+    def test_delete_missing_key_raises_key_error(self):
+        """Testcase: deleting a key that is not present raises KeyError"""
+        persistent_map = PersistentMap().set('a', 1)
+        with self.assertRaises(KeyError):
+            persistent_map.delete('b')
+
+    def test_many_keys_match_dict(self):
+        """Testcase: a map built from many keys
+        agrees with a dict built from the same keys"""
+        persistent_map = PersistentMap()
+        expected = {}
+        for key in range(-500, 2000, 3):
+            persistent_map = persistent_map.set(key, key * 2)
+            expected[key] = key * 2
+        for key in range(-500, 2000, 6):
+            persistent_map = persistent_map.delete(key)
+            del expected[key]
+        self.assertEqual(len(persistent_map), len(expected))
+        self.assertEqual(dict(persistent_map.items()), expected)
+        self.assertEqual(set(persistent_map), set(expected))
+
+    def test_colliding_hashes_are_kept_apart(self):
+        """Testcase: keys with identical hashes are stored and removed
+        independently"""
+        first = CollidingKey(7, 'first')
+        second = CollidingKey(7, 'second')
+        persistent_map = PersistentMap().set(first, 1).set(second, 2)
+        self.assertEqual(persistent_map.get(first), 1)
+        self.assertEqual(persistent_map.get(second), 2)
+        new_map = persistent_map.delete(first)
+        self.assertNotIn(first, new_map)
+        self.assertEqual(new_map.get(second), 2)
+        self.assertEqual(len(new_map), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,8 +11,23 @@
 # like "test_queen_count", since it doesn't entirely test the "queen_count" method,
 # but instead focuses on just one aspect of how it behaves.  You'll want to do likewise.
 
+import asyncio
+import concurrent.futures
+import io
+import mmap
+import tempfile
 import unittest
+from unittest import mock
 from queens import QueensState, Position, DuplicateQueenError, MissingQueenError
+from queens import solve, count_solutions, iter_solutions, solve_async
+from queens import any_queens_unsafe_in_batch, TranspositionTable
+from queens import write_snapshots, read_snapshots, profiling
+import queens
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 
@@ -411,6 +426,857 @@ class TestQueensState(unittest.TestCase):
         self.assertIn(Position(1, 1), current_state.queens())
         self.assertNotIn(Position(1, 1), state.queens())
 
+    def test_queens_unsafe_true_anti_diagonals_sq(self):
+        """Testcase: queens_unsafe() should return True if queen can
+        be captured by at least one other queen on the board
+        by anti-diagonals"""
+        state = QueensState(8, 8)
+        state.queen_position = [Position(1, 2), Position(2, 1)]
+        self.assertTrue(state.any_queens_unsafe())
+
+    def test_queens_unsafe_true_anti_diagonals_rect(self):
+        """Testcase: queens_unsafe() should return True if queen can
+        be captured by at least one other queen on the board
+        by anti-diagonals"""
+        state = QueensState(4, 8)
+        state.queen_position = [Position(0, 5), Position(3, 2)]
+        self.assertTrue(state.any_queens_unsafe())
+
+    def test_has_queen_follows_added_and_removed_queens(self):
+        """Testcase: has_queen() reflects queens added and removed
+        in derived states without affecting the original state"""
+        state = QueensState(8, 8)
+        added_state = state.with_queens_added([Position(3, 4)])
+        removed_state = added_state.with_queens_removed([Position(3, 4)])
+        self.assertFalse(state.has_queen(Position(3, 4)))
+        self.assertTrue(added_state.has_queen(Position(3, 4)))
+        self.assertFalse(removed_state.has_queen(Position(3, 4)))
+
+    def test_queens_unsafe_follows_added_and_removed_queens(self):
+        """Testcase: any_queens_unsafe() reflects conflicts introduced
+        and resolved by derived states"""
+        state = QueensState(8, 8).with_queens_added(
+            [Position(0, 0), Position(1, 2)])
+        unsafe_state = state.with_queens_added([Position(3, 2)])
+        safe_state = unsafe_state.with_queens_removed([Position(1, 2)])
+        self.assertFalse(state.any_queens_unsafe())
+        self.assertTrue(unsafe_state.any_queens_unsafe())
+        self.assertFalse(safe_state.any_queens_unsafe())
+
+    def test_queens_unsafe_derived_states_match_rebuilt_states(self):
+        """Testcase: conflicts carried forward through added and removed
+        queens agree with a state holding the same queens from scratch"""
+        state = QueensState(6, 6)
+        moves = [
+            ([Position(0, 1), Position(1, 3)], []),
+            ([Position(2, 5)], []),
+            ([Position(3, 0)], [Position(1, 3)]),
+            ([Position(4, 2), Position(5, 4)], []),
+            ([], [Position(2, 5)]),
+            ([Position(1, 3), Position(2, 5)], [Position(4, 2)])]
+        for added, removed in moves:
+            state = state.with_queens_added(added).with_queens_removed(removed)
+            rebuilt_state = QueensState(6, 6)
+            rebuilt_state.queen_position = list(state.queens())
+            self.assertEqual(
+                state.any_queens_unsafe(), rebuilt_state.any_queens_unsafe())
+
+    def test_queen_position_with_duplicates_raises_error(self):
+        """raise DuplicateQueenError when the queens assigned
+        to a board include the same position twice"""
+        state = QueensState(8, 8)
+        with self.assertRaises(DuplicateQueenError):
+            state.queen_position = [Position(1, 1), Position(2, 2),
+                                    Position(1, 1)]
+
+    def test_queens_added_off_board_are_kept_sq(self):
+        """Testcase: queens can be added outside the chessboard,
+        and are found, attacked and removed like any others"""
+        off_board = [Position(8, 0), Position(0, -1), Position(-5, 12)]
+        state = QueensState(8, 8).with_queens_added(
+            off_board + [Position(3, 3)])
+        self.assertEqual(state.queen_count(), 4)
+        self.assertEqual(state.queen_position, off_board + [Position(3, 3)])
+        for position in off_board:
+            self.assertTrue(state.has_queen(position))
+        self.assertFalse(state.any_queens_unsafe())
+        self.assertTrue(
+            state.with_queens_added([Position(4, 0)]).any_queens_unsafe())
+        self.assertEqual(state.safe_columns(1), [2, 4])
+        state = state.with_queens_removed(off_board)
+        self.assertEqual(state.queens(), [Position(3, 3)])
+        with self.assertRaises(DuplicateQueenError):
+            state.with_queens_added([Position(-1, 0), Position(-1, 0)])
+
+    def test_queens_added_off_board_are_kept_rect(self):
+        """Testcase: queens outside a chessboard that isn't square are kept,
+        compared and recorded like the others"""
+        state = QueensState(4, 8)
+        state.queen_position = [Position(0, 8), Position(4, 4)]
+        self.assertEqual(state.queens(), [Position(0, 8), Position(4, 4)])
+        self.assertTrue(state.any_queens_unsafe())
+        self.assertEqual(
+            state.first_conflict(), (Position(0, 8), Position(4, 4)))
+        self.assertEqual(
+            state, QueensState(4, 8).with_queens_added(
+                [Position(4, 4), Position(0, 8)]))
+        self.assertEqual(QueensState.from_bytes(state.to_bytes()), state)
+
+    def test_has_queen_false_off_board(self):
+        """Testcase: has_queen() should return False
+        for a position outside the chessboard"""
+        state = QueensState(4, 8).with_queens_added([Position(0, 0)])
+        self.assertFalse(state.has_queen(Position(0, 8)))
+        self.assertFalse(state.has_queen(Position(-1, 0)))
+
+    def test_queens_removed_off_board_raises_missing_queen_error(self):
+        """raise MissingQueenError when removing a queen
+        from outside the chessboard"""
+        state = QueensState(4, 8)
+        with self.assertRaises(MissingQueenError):
+            state.with_queens_removed([Position(4, 0)])
+
+    def test_first_conflict_none_when_safe(self):
+        """Testcase: first_conflict() returns None
+        when no queens attack each other"""
+        state = QueensState(8, 8).with_queens_added(
+            [Position(0, 0), Position(1, 2)])
+        self.assertIsNone(state.first_conflict())
+        self.assertEqual(state.conflicting_pairs(), [])
+
+    def test_first_conflict_returns_attacking_queens_rect(self):
+        """Testcase: first_conflict() returns two queens
+        that attack each other"""
+        state = QueensState(4, 8).with_queens_added(
+            [Position(0, 0), Position(3, 7), Position(1, 5)])
+        self.assertCountEqual(
+            state.first_conflict(), [Position(3, 7), Position(1, 5)])
+
+    def test_conflicting_pairs_finds_every_pair_sq(self):
+        """Testcase: conflicting_pairs() returns each pair
+        of attacking queens once"""
+        state = QueensState(8, 8).with_queens_added(
+            [Position(0, 0), Position(0, 4), Position(4, 4), Position(6, 1)])
+        pairs = [set(pair) for pair in state.conflicting_pairs()]
+        self.assertCountEqual(pairs, [
+            {Position(0, 0), Position(0, 4)},
+            {Position(0, 4), Position(4, 4)},
+            {Position(0, 0), Position(4, 4)}])
+
+    def test_conflicting_pairs_follow_removed_queens(self):
+        """Testcase: conflicting_pairs() and first_conflict() reflect
+        queens removed from a state"""
+        state = QueensState(8, 8).with_queens_added(
+            [Position(1, 1), Position(1, 5), Position(3, 1)])
+        state.conflicting_pairs()
+        new_state = state.with_queens_removed([Position(1, 1)])
+        self.assertEqual(new_state.conflicting_pairs(), [])
+        self.assertIsNone(new_state.first_conflict())
+        self.assertEqual(len(state.conflicting_pairs()), 2)
+
+    def test_large_batch_added_matches_queens_added_one_at_a_time(self):
+        """Testcase: adding a large batch of queens at once gives the same
+        state as adding them one at a time, leaving the original alone"""
+        state = QueensState(64, 64).with_queens_added([Position(0, 0)])
+        positions = [Position(row, row * 3 % 64) for row in range(1, 64)]
+        new_state = state.with_queens_added(positions)
+        one_at_a_time = state
+        for position in positions:
+            one_at_a_time = one_at_a_time.with_queens_added([position])
+        self.assertEqual(new_state, one_at_a_time)
+        self.assertEqual(new_state.queens(), one_at_a_time.queens())
+        self.assertEqual(
+            new_state.any_queens_unsafe(), one_at_a_time.any_queens_unsafe())
+        self.assertEqual(state.queen_count(), 1)
+
+    def test_large_batch_with_duplicate_queen_raises(self):
+        """raise DuplicateQueenError when a large batch repeats a queen
+        already on the board or one earlier in the batch"""
+        state = QueensState(64, 64).with_queens_added([Position(5, 5)])
+        positions = [Position(0, column) for column in range(64)]
+        with self.assertRaises(DuplicateQueenError):
+            state.with_queens_added(positions + [Position(5, 5)])
+        with self.assertRaises(DuplicateQueenError):
+            state.with_queens_added(positions + [Position(0, 7)])
+
+    def test_large_batch_reports_first_bad_position(self):
+        """Testcase: the error raised for a large batch is the one
+        for its first bad position"""
+        state = QueensState(64, 64)
+        positions = [Position(1, column) for column in range(64)]
+        with self.assertRaises(DuplicateQueenError) as context:
+            state.with_queens_added(
+                positions + [Position(1, 3), Position(64, 0)])
+        self.assertEqual(
+            str(context.exception), 'duplicate queen in row 1 column 3')
+        with self.assertRaises(DuplicateQueenError) as context:
+            state.with_queens_added(
+                positions + [Position(64, 0), Position(64, 0),
+                             Position(1, 3)])
+        self.assertEqual(
+            str(context.exception), 'duplicate queen in row 64 column 0')
+
+    def test_queens_state_has_no_instance_dictionary(self):
+        """Testcase: QueensState uses __slots__ to stay compact"""
+        state = QueensState(8, 8).with_queens_added([Position(1, 1)])
+        self.assertFalse(hasattr(state, '__dict__'))
+
+    def test_queens_in_row_and_column_sq(self):
+        """Testcase: queens_in_row() and queens_in_column() return
+        only the queens in that row or column"""
+        state = QueensState(8, 8).with_queens_added(
+            [Position(2, 1), Position(2, 6), Position(5, 1)])
+        self.assertCountEqual(
+            state.queens_in_row(2), [Position(2, 1), Position(2, 6)])
+        self.assertCountEqual(
+            state.queens_in_column(1), [Position(2, 1), Position(5, 1)])
+        self.assertEqual(state.queens_in_row(3), [])
+        self.assertEqual(state.queens_in_column(6), [Position(2, 6)])
+
+    def test_queens_in_row_follows_removed_queens_rect(self):
+        """Testcase: queens_in_row() reflects queens removed
+        from a row, leaving the original state alone"""
+        state = QueensState(4, 8).with_queens_added(
+            [Position(3, 0), Position(3, 4), Position(3, 7)])
+        new_state = state.with_queens_removed([Position(3, 4)])
+        self.assertCountEqual(
+            new_state.queens_in_row(3), [Position(3, 0), Position(3, 7)])
+        new_state = new_state.with_queens_removed([Position(3, 7)])
+        self.assertEqual(new_state.queens_in_row(3), [Position(3, 0)])
+        self.assertEqual(len(state.queens_in_row(3)), 3)
+
+    def test_attackers_of_finds_queens_on_every_line(self):
+        """Testcase: attackers_of() returns the queens sharing a row,
+        column or diagonal with a position, but not one in it"""
+        state = QueensState(8, 8).with_queens_added(
+            [Position(3, 3), Position(3, 7), Position(0, 3), Position(1, 1),
+             Position(5, 1), Position(4, 6)])
+        self.assertCountEqual(
+            state.attackers_of(Position(3, 3)),
+            [Position(3, 7), Position(0, 3), Position(1, 1), Position(5, 1)])
+        self.assertEqual(state.attackers_of(Position(8, 0)), [])
+
+    def test_attackers_of_on_huge_sparse_board(self):
+        """Testcase: attackers_of() works on a sparse board
+        with a million rows and columns"""
+        size = 10 ** 6
+        state = QueensState(size, size).with_queens_added(
+            [Position(row, row * 7) for row in range(0, size // 7, 997)])
+        self.assertCountEqual(
+            state.attackers_of(Position(997, 0)),
+            [Position(997, 6979), Position(0, 0)])
+        self.assertEqual(state.queens_in_column(6979), [Position(997, 6979)])
+
+    def test_safe_columns_skips_attacked_cells_sq(self):
+        """Testcase: safe_columns() leaves out columns attacked
+        along a column or either diagonal"""
+        state = QueensState(8, 8).with_queens_added([Position(0, 3)])
+        self.assertEqual(state.safe_columns(2), [0, 2, 4, 6, 7])
+        self.assertEqual(state.safe_columns(0), [])
+
+    def test_safe_columns_skips_attacked_cells_rect(self):
+        """Testcase: safe_columns() works on a board with more columns
+        than rows"""
+        state = QueensState(4, 8).with_queens_added(
+            [Position(0, 0), Position(1, 6)])
+        self.assertEqual(state.safe_columns(3), [1, 2, 5, 7])
+        self.assertEqual(state.safe_columns(4), [])
+
+    def test_safe_columns_follow_added_and_removed_queens(self):
+        """Testcase: safe_columns() stays correct as queens are added to
+        and removed from a state that has already answered it"""
+        state = QueensState(6, 6).with_queens_added([Position(0, 0)])
+        self.assertEqual(state.safe_columns(1), [2, 3, 4, 5])
+        state = state.with_queens_added([Position(1, 2)])
+        self.assertEqual(state.safe_columns(2), [4, 5])
+        state = state.with_queens_removed([Position(0, 0)])
+        self.assertEqual(state.safe_columns(2), [0, 4, 5])
+
+    def test_is_attacked_sq(self):
+        """Testcase: is_attacked() is True only for positions
+        that share a line with another queen"""
+        state = QueensState(8, 8).with_queens_added([Position(2, 2)])
+        self.assertTrue(state.is_attacked(Position(5, 5)))
+        self.assertTrue(state.is_attacked(Position(2, 7)))
+        self.assertFalse(state.is_attacked(Position(2, 2)))
+        self.assertFalse(state.is_attacked(Position(3, 5)))
+
+
+class TestSolve(unittest.TestCase):
+    """Testing class for solve()"""
+    def assert_is_solution(self, solution, rows, columns):
+        """Asserts that the given state holds a solution
+        for a board with the given numbers of rows and columns"""
+        self.assertIsNotNone(solution)
+        self.assertEqual((solution.rows, solution.columns), (rows, columns))
+        self.assertEqual(solution.queen_count(), min(rows, columns))
+        self.assertFalse(solution.any_queens_unsafe())
+        for queen in solution.queens():
+            self.assertTrue(0 <= queen.row < rows)
+            self.assertTrue(0 <= queen.column < columns)
+
+    def test_every_strategy_solves_sq(self):
+        """Testcase: every built-in strategy solves square boards"""
+        for strategy in ('auto', 'backtracking', 'min_conflicts',
+                         'constructive'):
+            for n in (1, 4, 5, 6, 8, 9, 14, 15):
+                with self.subTest(strategy=strategy, n=n):
+                    self.assert_is_solution(
+                        solve(n, n, strategy, **(
+                            {'seed': n} if strategy == 'min_conflicts'
+                            else {})), n, n)
+
+    def test_every_strategy_solves_rect(self):
+        """Testcase: every built-in strategy solves boards that are wider
+        than they are tall, and boards that are taller than they are wide"""
+        for strategy in ('auto', 'backtracking', 'min_conflicts',
+                         'constructive'):
+            for rows, columns in ((4, 8), (8, 4), (7, 12), (12, 7)):
+                with self.subTest(strategy=strategy, rows=rows,
+                                  columns=columns):
+                    self.assert_is_solution(
+                        solve(rows, columns, strategy, **(
+                            {'seed': rows} if strategy == 'min_conflicts'
+                            else {})), rows, columns)
+
+    def test_unsolvable_boards_have_no_solution(self):
+        """Testcase: solve() returns None when a board has no solution"""
+        for n in (2, 3):
+            self.assertIsNone(solve(n, n))
+            self.assertIsNone(solve(n, n, 'backtracking'))
+
+    def test_narrow_unsolvable_sizes_solved_when_wider(self):
+        """Testcase: a board too short for the constructive placement
+        is still solved when it's wide enough"""
+        for strategy in ('auto', 'constructive'):
+            with self.subTest(strategy=strategy):
+                self.assert_is_solution(solve(2, 4, strategy), 2, 4)
+                self.assert_is_solution(solve(3, 5, strategy), 3, 5)
+                self.assert_is_solution(solve(5, 2, strategy), 5, 2)
+                self.assertIsNone(solve(3, 3, strategy))
+
+    def test_large_board_solved_by_construction(self):
+        """Testcase: the constructive strategy handles large boards"""
+        for n in (1000, 1001, 1002, 1003, 1004, 1005):
+            with self.subTest(n=n):
+                self.assert_is_solution(solve(n, n, 'constructive'), n, n)
+
+    def test_solution_known_to_be_safe_without_an_index(self):
+        """Testcase: a solution's queens are known to be safe without
+        indexing them, though they're still indexed when queried"""
+        solution = solve(1000, 1000)
+        with mock.patch.object(
+                QueensState, '_index', side_effect=AssertionError):
+            self.assertFalse(solution.any_queens_unsafe())
+            self.assertIsNone(solution.first_conflict())
+            self.assertEqual(solution.conflicting_pairs(), [])
+            self.assertTrue(solution.has_queen(solution.queens()[0]))
+        self.assertEqual(len(solution.queens_in_row(0)), 1)
+
+    def test_custom_strategy_is_used(self):
+        """Testcase: a function can be given as the strategy"""
+        def diagonal_strategy(lines, width, *, offset):
+            return [(line * 2 + offset) % width for line in range(lines)]
+
+        solution = solve(5, 5, diagonal_strategy, offset=1)
+        self.assertEqual(
+            solution.queens(),
+            [Position(0, 1), Position(1, 3), Position(2, 0), Position(3, 2),
+             Position(4, 4)])
+
+    def test_custom_strategy_cells_are_checked(self):
+        """raise ValueError when a strategy's cells aren't one on the board
+        for each line"""
+        for cells in ([5, -1, 3, 0], [1, 3, 0, 4], [1, 3], [1, 3, 0, 2, 1]):
+            with self.subTest(cells=cells):
+                with self.assertRaises(ValueError):
+                    solve(4, 4, lambda lines, width: cells)
+        with self.assertRaises(ValueError):
+            solve(6, 4, lambda lines, width: [1, 3, 0, 6])
+
+    def test_unknown_strategy_raises_value_error(self):
+        """raise ValueError when the strategy's name isn't known"""
+        with self.assertRaises(ValueError):
+            solve(8, 8, 'guessing')
+
+
+class TestCountSolutions(unittest.TestCase):
+    """Testing class for count_solutions()"""
+    def test_count_solutions_empty_sq(self):
+        """Testcase: counts match the known numbers of n-queens solutions"""
+        known_counts = {1: 1, 2: 0, 3: 0, 4: 2, 5: 10, 6: 4, 7: 40, 8: 92,
+                        9: 352}
+        for n, known_count in known_counts.items():
+            with self.subTest(n=n):
+                result = count_solutions(QueensState(n, n), processes=1)
+                self.assertEqual(result.total, known_count)
+
+    def test_count_solutions_empty_rect(self):
+        """Testcase: boards wider than they are tall, and taller than they
+        are wide, have the same number of solutions"""
+        wide = count_solutions(QueensState(4, 6), processes=1)
+        tall = count_solutions(QueensState(6, 4), processes=1)
+        self.assertEqual(wide.total, 46)
+        self.assertEqual(tall.total, 46)
+
+    def test_count_solutions_with_queens_sq(self):
+        """Testcase: only solutions including the state's queens are counted,
+        whether or not those queens are arranged symmetrically"""
+        centered = QueensState(7, 7).with_queens_added([Position(3, 3)])
+        off_center = QueensState(7, 7).with_queens_added([Position(2, 1)])
+        self.assertEqual(count_solutions(centered, processes=1).total, 8)
+        self.assertEqual(count_solutions(off_center, processes=1).total, 6)
+
+    def test_count_solutions_with_queens_rect(self):
+        """Testcase: only solutions including the state's queens are counted
+        on a board that is taller than it is wide"""
+        state = QueensState(6, 4).with_queens_added([Position(0, 1)])
+        self.assertEqual(count_solutions(state, processes=1).total, 10)
+
+    def test_count_solutions_unsafe_queens(self):
+        """Testcase: a state whose queens attack each other has no
+        solutions"""
+        state = QueensState(8, 8).with_queens_added(
+            [Position(0, 0), Position(1, 1)])
+        self.assertEqual(count_solutions(state, processes=1).total, 0)
+
+    def test_count_solutions_in_parallel(self):
+        """Testcase: counting across processes gives the same total, and
+        reports each process's share of the work"""
+        result = count_solutions(QueensState(8, 8), processes=2)
+        self.assertEqual(result.total, 92)
+        self.assertTrue(1 <= len(result.workers) <= 2)
+        # By symmetry, only the first row's left four cells are searched,
+        # each with all eight cells on the second row.
+        self.assertEqual(
+            sum(worker.subtrees for worker in result.workers.values()), 32)
+        self.assertTrue(
+            all(worker.nodes > 0 for worker in result.workers.values()))
+
+
+class TestIterSolutions(unittest.TestCase):
+    """Testing class for iter_solutions()"""
+    def test_iter_solutions_sq(self):
+        """Testcase: every solution is generated once, in increasing order"""
+        solutions = list(iter_solutions(QueensState(6, 6)))
+        self.assertEqual(
+            solutions,
+            [(1, 3, 5, 0, 2, 4), (2, 5, 1, 4, 0, 3), (3, 0, 4, 1, 5, 2),
+             (4, 2, 0, 5, 3, 1)])
+
+    def test_iter_solutions_rect(self):
+        """Testcase: on a board taller than it is wide, each solution holds
+        the row of the queen in each column"""
+        state = QueensState(6, 4)
+        solutions = list(iter_solutions(state))
+        self.assertEqual(len(solutions), 46)
+        for solution in solutions:
+            queens = [Position(row, column)
+                      for column, row in enumerate(solution)]
+            self.assertFalse(state.with_queens_added(queens)
+                             .any_queens_unsafe())
+
+    def test_iter_solutions_with_queens(self):
+        """Testcase: only solutions including the state's queens
+        are generated"""
+        state = QueensState(7, 7).with_queens_added([Position(2, 1)])
+        solutions = list(iter_solutions(state))
+        self.assertEqual(len(solutions), 6)
+        self.assertTrue(all(solution[2] == 1 for solution in solutions))
+
+    def test_iter_solutions_is_lazy(self):
+        """Testcase: solutions are generated one at a time, as requested"""
+        solutions = iter_solutions(QueensState(16, 16))
+        self.assertEqual(len(next(solutions)), 16)
+        self.assertEqual(len(next(solutions)), 16)
+
+    def test_iter_solutions_resumes_after_checkpoint(self):
+        """Testcase: passing a solution as 'after' resumes with
+        the solutions that follow it"""
+        solutions = list(iter_solutions(QueensState(8, 8)))
+        for index in (0, 10, 50, 90, 91):
+            with self.subTest(index=index):
+                resumed = list(iter_solutions(
+                    QueensState(8, 8), after=solutions[index]))
+                self.assertEqual(resumed, solutions[index + 1:])
+
+    def test_iter_solutions_invalid_checkpoint_raises_value_error(self):
+        """raise ValueError when 'after' isn't a solution"""
+        with self.assertRaises(ValueError):
+            list(iter_solutions(QueensState(4, 4), after=(0, 1, 2, 3)))
+
+
+class TestAnyQueensUnsafeInBatch(unittest.TestCase):
+    """Testing class for any_queens_unsafe_in_batch()"""
+    def test_batch_of_states(self):
+        """Testcase: each state's result matches any_queens_unsafe(),
+        including states of different sizes and queen counts"""
+        states = [
+            QueensState(8, 8),
+            QueensState(8, 8).with_queens_added(
+                [Position(0, 0), Position(1, 2)]),
+            QueensState(4, 8).with_queens_added(
+                [Position(0, 5), Position(3, 2)]),
+            QueensState(8, 4).with_queens_added(
+                [Position(1, 1), Position(7, 1)]),
+            solve(6, 6)]
+        self.assertEqual(
+            list(any_queens_unsafe_in_batch(states)),
+            [False, False, True, True, False])
+
+    def test_batch_of_coordinates(self):
+        """Testcase: boards given as rows and columns of queens
+        are checked for every kind of attack"""
+        boards = [
+            [(0, 0), (1, 2), (2, 4)],
+            [(0, 0), (0, 5), (2, 4)],
+            [(0, 1), (3, 1), (5, 7)],
+            [(1, 1), (2, 5), (4, 4)],
+            [(1, 2), (2, 1), (6, 6)]]
+        self.assertEqual(
+            list(any_queens_unsafe_in_batch(boards)),
+            [False, True, True, True, True])
+
+    def test_batch_checked_one_at_a_time(self):
+        """Testcase: checking boards one at a time, as is done without
+        NumPy, gives the same results"""
+        boards = [[(0, 0), (1, 2)], [(0, 0), (2, 2)],
+                  QueensState(8, 8).with_queens_added([Position(3, 3)])]
+        self.assertEqual(
+            queens._any_queens_unsafe_in_batch_slowly(boards),
+            [False, True, False])
+
+    def test_batch_of_any_iterable(self):
+        """Testcase: boards may come from any iterable, may be empty, and
+        may mix QueensStates with coordinates, with or without NumPy"""
+        boards = [[(0, 0), (1, 1)], [], [(2, 3)],
+                  QueensState(8, 8).with_queens_added([Position(3, 3)])]
+        expected = [True, False, False, False]
+        self.assertEqual(
+            list(any_queens_unsafe_in_batch(iter(boards))), expected)
+        self.assertEqual(list(any_queens_unsafe_in_batch([[]])), [False])
+        self.assertEqual(
+            queens._any_queens_unsafe_in_batch_slowly(iter(boards)),
+            expected)
+        self.assertEqual(
+            queens._any_queens_unsafe_in_batch_slowly([[]]), [False])
+
+    @unittest.skipUnless(numpy, 'NumPy is not installed')
+    def test_batch_of_coordinates_array(self):
+        """Testcase: a NumPy array of boards gives a NumPy mask"""
+        boards = numpy.array([
+            [[0, 0], [1, 2], [2, 4]],
+            [[0, 0], [4, 0], [2, 4]]])
+        unsafe = any_queens_unsafe_in_batch(boards)
+        self.assertIsInstance(unsafe, numpy.ndarray)
+        self.assertEqual(unsafe.tolist(), [False, True])
+
+    @unittest.skipUnless(numpy, 'NumPy is not installed')
+    def test_batch_of_coordinates_wrong_shape_raises_value_error(self):
+        """raise ValueError when an array of boards has the wrong shape"""
+        with self.assertRaises(ValueError):
+            any_queens_unsafe_in_batch(numpy.zeros((3, 4)))
+
+
+class TestCanonicalHash(unittest.TestCase):
+    """Testing class for QueensState equality and canonical hashing"""
+    def test_states_with_same_queens_are_equal_sq(self):
+        """Testcase: states with the same queens, added in different orders,
+        are equal and have equal hashes"""
+        first = QueensState(8, 8).with_queens_added(
+            [Position(1, 2), Position(5, 3)])
+        second = QueensState(8, 8).with_queens_added(
+            [Position(5, 3)]).with_queens_added([Position(1, 2)])
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+
+    def test_states_with_different_dimensions_are_not_equal(self):
+        """Testcase: empty states of different sizes are not equal"""
+        self.assertNotEqual(QueensState(4, 8), QueensState(8, 4))
+
+    def test_canonical_hash_same_for_symmetries_sq(self):
+        """Testcase: every rotation and reflection of a square board
+        has the same canonical hash"""
+        positions = [Position(0, 1), Position(2, 0), Position(3, 3)]
+        state = QueensState(5, 5).with_queens_added(positions)
+        for transform in [
+                lambda row, column: Position(column, 4 - row),
+                lambda row, column: Position(4 - row, 4 - column),
+                lambda row, column: Position(4 - column, row),
+                lambda row, column: Position(row, 4 - column),
+                lambda row, column: Position(column, row)]:
+            with self.subTest(transform=transform):
+                other = QueensState(5, 5).with_queens_added(
+                    [transform(*position) for position in positions])
+                self.assertNotEqual(state, other)
+                self.assertEqual(
+                    state.canonical_hash(), other.canonical_hash())
+
+    def test_canonical_hash_same_for_symmetries_rect(self):
+        """Testcase: flipping or turning around a board that isn't square
+        leaves its canonical hash unchanged"""
+        state = QueensState(4, 8).with_queens_added(
+            [Position(0, 1), Position(3, 4)])
+        for positions in [[Position(3, 1), Position(0, 4)],
+                          [Position(0, 6), Position(3, 3)],
+                          [Position(3, 6), Position(0, 3)]]:
+            with self.subTest(positions=positions):
+                other = QueensState(4, 8).with_queens_added(positions)
+                self.assertEqual(
+                    state.canonical_hash(), other.canonical_hash())
+
+    def test_canonical_hash_differs_for_different_arrangements(self):
+        """Testcase: arrangements that aren't symmetries of one another
+        have different canonical hashes"""
+        state = QueensState(8, 8).with_queens_added([Position(0, 1)])
+        other = QueensState(8, 8).with_queens_added([Position(0, 2)])
+        self.assertNotEqual(state.canonical_hash(), other.canonical_hash())
+
+    def test_hash_follows_added_and_removed_queens(self):
+        """Testcase: hashes kept up to date as queens are added and removed
+        match those computed from scratch"""
+        state = QueensState(6, 9)
+        state.canonical_hash()
+        state = state.with_queens_added([Position(1, 7), Position(4, 2)])
+        state = state.with_queens_removed([Position(1, 7)])
+        state = state.with_queens_added([Position(5, 5)])
+        rebuilt = QueensState(6, 9)
+        rebuilt.queen_position = [Position(4, 2), Position(5, 5)]
+        self.assertEqual(hash(state), hash(rebuilt))
+        self.assertEqual(state.canonical_hash(), rebuilt.canonical_hash())
+
+
+class TestTranspositionTable(unittest.TestCase):
+    """Testing class for TranspositionTable"""
+    def test_symmetric_states_share_an_entry(self):
+        """Testcase: a value stored for a state
+        is found for its mirror image"""
+        table = TranspositionTable()
+        table[QueensState(4, 4).with_queens_added([Position(0, 1)])] = 'x'
+        mirror = QueensState(4, 4).with_queens_added([Position(0, 2)])
+        self.assertIn(mirror, table)
+        self.assertEqual(table[mirror], 'x')
+        self.assertEqual(len(table), 1)
+
+    def test_get_missing_state_returns_default(self):
+        """Testcase: get() returns the default for a state not in the table"""
+        table = TranspositionTable()
+        self.assertIsNone(table.get(QueensState(4, 4)))
+        self.assertEqual(table.get(QueensState(4, 4), 0), 0)
+
+    def test_add_skips_symmetric_solutions(self):
+        """Testcase: the 92 solutions on an 8x8 board
+        are 12 distinct solutions up to symmetry"""
+        table = TranspositionTable()
+        for columns in iter_solutions(QueensState(8, 8)):
+            table.add(QueensState(8, 8).with_queens_added(
+                [Position(row, column)
+                 for row, column in enumerate(columns)]))
+        self.assertEqual(len(table), 12)
+
+    def test_colliding_hashes_are_told_apart(self):
+        """Testcase: states that aren't symmetric to each other get their
+        own entries even when their canonical hashes collide"""
+        table = TranspositionTable()
+        first = QueensState(4, 4).with_queens_added([Position(0, 1)])
+        mirror = QueensState(4, 4).with_queens_added([Position(3, 1)])
+        other = QueensState(4, 4).with_queens_added([Position(1, 1)])
+        with mock.patch.object(QueensState, 'canonical_hash', lambda self: 0):
+            self.assertTrue(table.add(first, 'first'))
+            self.assertNotIn(other, table)
+            self.assertTrue(table.add(other, 'other'))
+            self.assertFalse(table.add(mirror))
+            self.assertEqual(table[mirror], 'first')
+            self.assertEqual(table[other], 'other')
+            self.assertEqual(len(table), 2)
+            with self.assertRaises(KeyError):
+                table[QueensState(4, 4)]
+
+
+class TestSnapshots(unittest.TestCase):
+    """Testing class for QueensState snapshots"""
+    def test_snapshot_round_trip_sq(self):
+        """Testcase: a state rebuilt from its snapshot equals the original"""
+        state = QueensState(8, 8).with_queens_added(
+            [Position(7, 7), Position(0, 3), Position(4, 0)])
+        restored = QueensState.from_bytes(state.to_bytes())
+        self.assertEqual(restored, state)
+        self.assertEqual(
+            restored.queen_position,
+            [Position(0, 3), Position(4, 0), Position(7, 7)])
+
+    def test_snapshot_round_trip_rect(self):
+        """Testcase: snapshots keep the dimensions of boards
+        that aren't square, including empty ones"""
+        for state in [QueensState(4, 8), QueensState(9, 3).with_queens_added(
+                [Position(8, 2), Position(1, 1)])]:
+            with self.subTest(state=state):
+                restored = QueensState.from_bytes(state.to_bytes())
+                self.assertEqual(restored, state)
+                self.assertEqual(
+                    (restored.rows, restored.columns),
+                    (state.rows, state.columns))
+
+    def test_crowded_board_snapshot_uses_bitmap(self):
+        """Testcase: a board full of queens is recorded one bit per cell"""
+        state = QueensState(16, 16)
+        state.queen_position = [
+            Position(row, column) for row in range(16) for column in range(16)]
+        snapshot = state.to_bytes()
+        self.assertLessEqual(len(snapshot), 8 + 16 * 16 // 8)
+        self.assertEqual(QueensState.from_bytes(snapshot), state)
+
+    def test_snapshot_of_huge_sparse_board_is_small(self):
+        """Testcase: a few queens on a huge board take a few bytes each"""
+        state = QueensState(10 ** 6, 10 ** 6).with_queens_added(
+            [Position(10, 20), Position(999_999, 999_999)])
+        snapshot = state.to_bytes()
+        self.assertLess(len(snapshot), 32)
+        self.assertEqual(QueensState.from_bytes(snapshot), state)
+
+    def test_invalid_snapshots_raise_value_error(self):
+        """raise ValueError for snapshots that are truncated, have extra
+        data, or don't start with the magic number"""
+        snapshot = solve(8, 8).to_bytes()
+        for data in [snapshot[:-1], snapshot + b'\x00', b'XX' + snapshot[2:],
+                     b'']:
+            with self.subTest(data=data):
+                with self.assertRaises(ValueError):
+                    QueensState.from_bytes(data)
+
+    def test_many_snapshots_written_and_read_back(self):
+        """Testcase: snapshots written one after another to a file are read
+        back, in order, from a memory map of the file"""
+        states = [solve(size, size) for size in range(4, 40)]
+        states.append(QueensState(3, 5))
+        with tempfile.TemporaryFile() as file:
+            write_snapshots(states, file)
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self.assertEqual(list(read_snapshots(data)), states)
+
+    def test_snapshots_read_from_memoryview(self):
+        """Testcase: snapshots can be read from any buffer"""
+        buffer = io.BytesIO()
+        write_snapshots([solve(5, 7), solve(7, 5)], buffer)
+        restored = list(read_snapshots(buffer.getbuffer()))
+        self.assertEqual(restored, [solve(5, 7), solve(7, 5)])
+
+
+class TestProfiling(unittest.TestCase):
+    """Testing class for profiling()"""
+    def test_profiling_counts_operations(self):
+        """Testcase: profiling() counts states created, positions copied
+        and conflict checks"""
+        with profiling() as profile:
+            state = QueensState(8, 8)
+            state = state.with_queens_added([Position(0, 0), Position(1, 2)])
+            state.any_queens_unsafe()
+            state.safe_columns(3)
+            state.first_conflict()
+            state.conflicting_pairs()
+            state.queens()
+        self.assertEqual(profile.states_created, 2)
+        self.assertEqual(profile.positions_copied, 2)
+        self.assertEqual(profile.conflict_checks, 4)
+        self.assertGreater(profile.conflict_check_seconds, 0)
+        self.assertIn('conflict checks:        4', profile.report())
+
+    def test_profiling_counts_each_state_once(self):
+        """Testcase: replacing a state's queens copies positions without
+        creating a state, while states rebuilt from snapshots are counted"""
+        with profiling() as profile:
+            state = QueensState(8, 8)
+            state.queen_position = [Position(0, 0), Position(1, 2)]
+            QueensState.from_bytes(state.to_bytes())
+        self.assertEqual(profile.states_created, 2)
+        self.assertEqual(profile.positions_copied, 4)
+
+    def test_profiling_stops_counting_when_done(self):
+        """Testcase: nothing is counted after profiling() ends,
+        and the original methods are put back"""
+        any_queens_unsafe = QueensState.any_queens_unsafe
+        with profiling() as profile:
+            QueensState(4, 4).any_queens_unsafe()
+        QueensState(4, 4).any_queens_unsafe()
+        self.assertEqual(profile.states_created, 1)
+        self.assertEqual(profile.conflict_checks, 1)
+        self.assertIs(QueensState.any_queens_unsafe, any_queens_unsafe)
+
+    def test_profiling_restores_methods_after_exception(self):
+        """Testcase: the original methods are put back
+        even when the profiled code raises an exception"""
+        copy = QueensState._copy
+        with self.assertRaises(DuplicateQueenError):
+            with profiling():
+                QueensState(4, 4).with_queens_added(
+                    [Position(0, 0), Position(0, 0)])
+        self.assertIs(QueensState._copy, copy)
+
+
+class TestSolveAsync(unittest.TestCase):
+    """Testing class for solve_async()"""
+    def test_finds_same_solution_as_backtracking_sq(self):
+        """Testcase: solve_async() finds the solution
+        that backtracking finds"""
+        solution = asyncio.run(solve_async(8, 8))
+        self.assertEqual(solution, solve(8, 8, 'backtracking'))
+
+    def test_returns_none_without_solution_rect(self):
+        """Testcase: solve_async() returns None
+        for a board with no solution"""
+        self.assertIsNone(asyncio.run(solve_async(3, 3)))
+        self.assertIsNone(asyncio.run(solve_async(2, 2)))
+        self.assertIsNotNone(asyncio.run(solve_async(2, 5)))
+
+    def test_lets_other_tasks_run(self):
+        """Testcase: other tasks keep running while solve_async() searches"""
+        async def solve_while_counting():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            ticker = asyncio.create_task(tick())
+            solution = await solve_async(20, 20, pause_every=100)
+            ticker.cancel()
+            return solution, ticks
+
+        solution, ticks = asyncio.run(solve_while_counting())
+        self.assertFalse(solution.any_queens_unsafe())
+        self.assertGreater(ticks, 10)
+
+    def test_timeout_raises_timeout_error(self):
+        """raise TimeoutError when no solution is found in time"""
+        with self.assertRaises(TimeoutError):
+            asyncio.run(solve_async(29, 29, timeout=0.01))
+
+    def test_can_be_cancelled(self):
+        """Testcase: cancelling the task running solve_async()
+        stops the search"""
+        async def cancel_search():
+            task = asyncio.create_task(solve_async(29, 29))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await task
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(cancel_search())
+
+    def test_executor_solves_subtrees(self):
+        """Testcase: solve_async() can search in a process pool"""
+        async def solve_in_pool(rows, columns):
+            with concurrent.futures.ProcessPoolExecutor(2) as executor:
+                return await solve_async(rows, columns, executor=executor)
+
+        solution = asyncio.run(solve_in_pool(10, 6))
+        self.assertEqual(solution.queen_count(), 6)
+        self.assertFalse(solution.any_queens_unsafe())
+        self.assertIsNone(asyncio.run(solve_in_pool(3, 3)))
+
 
 if __name__ == '__main__':
     unittest.main()
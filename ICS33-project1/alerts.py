@@ -5,6 +5,10 @@
 
 class Alert:
     """Alert class represents an alert from a device."""
+    # An alert is made for every hop it takes, so alerts go without the usual
+    # per-object dictionary
+    __slots__ = ("device_id", "description", "time")
+
     def __init__(self, device_id: int, description: str, time: int):
         """__init_ method initializes the Alert object."""
         if device_id < 0:
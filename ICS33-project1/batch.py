@@ -0,0 +1,173 @@
+"""batch.py"""
+# Evan-Soobin Jeon
+# ejeon2@uci.edu
+#
+# Runs many simulations at once.  Given a directory of input files (every
+# .txt file in it) or a manifest (a text file listing one input file per line,
+# relative to the manifest), each input file is simulated by one of a pool of
+# processes, and its output is written to a file of the same name, ending in
+# .out, in the output directory (or, with --event-log, a binary event log
+# ending in .log).  Timing statistics for the whole batch are printed once
+# every simulation has finished.  With --partitions, the input files are
+# instead simulated one at a time, each with its devices split among that
+# many processes, which suits a few very large simulations better.
+#
+#     python batch.py scenarios/ --output-dir results/ --processes 8
+
+import argparse
+from contextlib import nullcontext
+from multiprocessing import Pool
+from pathlib import Path
+import time
+from outputs import TextOutput, EventLog
+from project1 import simulate_file
+
+
+class BatchReport:
+    """BatchReport summarizes the simulations run by run_batch."""
+    def __init__(self, timings: dict, failures: dict, wall_seconds: float):
+        """__init__ method initializes the report from the seconds each
+        input file took, the error message for each input file that failed,
+        and the seconds the whole batch took."""
+        self.timings = timings
+        self.failures = failures
+        self.wall_seconds = wall_seconds
+
+    def __str__(self):
+        """__str__ method returns the report's statistics, one per line."""
+        lines = [
+            f"FILES: {len(self.timings)}",
+            f"FAILED: {len(self.failures)}",
+            f"WALL SECONDS: {self.wall_seconds:.3f}"
+        ]
+        if self.timings:
+            total = sum(self.timings.values())
+            slowest = max(self.timings, key=self.timings.get)
+            lines += [
+                f"TOTAL SECONDS: {total:.3f}",
+                f"MEAN SECONDS: {total / len(self.timings):.3f}",
+                f"MIN SECONDS: {min(self.timings.values()):.3f}",
+                f"MAX SECONDS: {self.timings[slowest]:.3f} ({slowest})"
+            ]
+        lines += [
+            f"FAILURE {path}: {message}"
+            for path, message in sorted(self.failures.items())
+        ]
+        return "\n".join(lines)
+
+
+def find_input_files(source: Path) -> list[Path]:
+    """Returns the input files in the given directory,
+    or listed in the given manifest"""
+    if source.is_dir():
+        return sorted(source.glob("*.txt"))
+
+    input_files = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                input_files.append(source.parent / line)
+    return input_files
+
+
+def run_batch(
+        input_files: list[Path], output_directory: Path,
+        processes: int | None = None,
+        event_log: bool = False, streaming: bool = False,
+        partitions: int = 1) -> BatchReport:
+    """Simulates each of the input files in a pool of processes, writing
+    each one's output to its own file in the output directory, either as
+    text or as a binary event log.  When streaming, each input file's events
+    are read as they're reached, so they must be in order of time.  Given
+    more than one partition, the input files are simulated one at a time,
+    each split among that many processes instead."""
+    suffix = ".log" if event_log else ".out"
+    output_files = [
+        output_directory / f"{input_file.stem}{suffix}"
+        for input_file in input_files
+    ]
+    if len(set(output_files)) != len(output_files):
+        raise ValueError("input files must have different names.")
+    output_directory.mkdir(parents=True, exist_ok=True)
+
+    timings = {}
+    failures = {}
+    tasks = [
+        (input_file, output_file, event_log, streaming, partitions)
+        for input_file, output_file in zip(input_files, output_files)
+    ]
+    start = time.perf_counter()
+    # a pool's processes can't start processes of their own
+    with nullcontext() if partitions > 1 else Pool(processes) as pool:
+        results = (
+            map(_simulate_to_file, tasks) if pool is None
+            else pool.imap_unordered(_simulate_to_file, tasks)
+        )
+        for input_file, seconds, failure in results:
+            timings[str(input_file)] = seconds
+            if failure is not None:
+                failures[str(input_file)] = failure
+    return BatchReport(timings, failures, time.perf_counter() - start)
+
+
+def _simulate_to_file(task: tuple[Path, Path, bool, bool, int]) -> tuple:
+    """Simulates the input file, writing its output to the output file
+    (as an event log, if asked to), and returns the input file, the seconds
+    it took, and the error message if it failed (or None if it didn't)"""
+    input_file, output_file, event_log, streaming, partitions = task
+    start = time.perf_counter()
+    if not input_file.exists():
+        return (input_file, time.perf_counter() - start,
+                f"FileNotFoundError: {input_file}")
+    failure = None
+    if event_log:
+        file = open(output_file, "wb")
+        output = EventLog(file)
+    else:
+        file = open(output_file, "w", encoding="utf-8")
+        output = TextOutput(file)
+    with file:
+        try:
+            simulate_file(input_file, output, streaming, partitions)
+        except Exception as error:
+            failure = f"{type(error).__name__}: {error}"
+        output.flush()
+    return input_file, time.perf_counter() - start, failure
+
+
+def main() -> None:
+    """Runs a batch of simulations given on the command line"""
+    parser = argparse.ArgumentParser(
+        description="Run many alert simulations at once.")
+    parser.add_argument(
+        "source", type=Path,
+        help="a directory of input files, or a manifest listing them")
+    parser.add_argument(
+        "--output-dir", type=Path, default=Path("outputs"),
+        help="the directory to write each simulation's output to")
+    parser.add_argument(
+        "--processes", type=int, default=None,
+        help="the number of processes to use (default: one per CPU)")
+    parser.add_argument(
+        "--event-log", action="store_true",
+        help="write binary event logs instead of text")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="read each input file's events as they're reached "
+             "(they must be in order of time)")
+    parser.add_argument(
+        "--partitions", type=int, default=1,
+        help="simulate one input file at a time, with its devices split "
+             "among this many processes")
+    arguments = parser.parse_args()
+
+    report = run_batch(
+        find_input_files(arguments.source), arguments.output_dir,
+        arguments.processes, arguments.event_log, arguments.stream,
+        arguments.partitions)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
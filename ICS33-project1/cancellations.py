@@ -5,6 +5,9 @@
 
 class Cancellation:
     """Cancellation class for handling cancellation messages."""
+    # Cancellations spread as far as alerts do, and are kept as small
+    __slots__ = ("device_id", "description", "time")
+
     def __init__(self, device_id: int, description: str, time: int):
         if device_id < 0:
             raise ValueError("device_id must be a non-negative integer.")
@@ -4,10 +4,18 @@
 
 from alerts import Alert
 from cancellations import Cancellation
+from outputs import TextOutput, EventLog
+
+# Devices given no output print each message as soon as it happens
+_UNBUFFERED_OUTPUT = TextOutput(buffer_size=0)
 
 
 class Device:
     """Device class that represents a device in the system."""
+    # A network may hold a great many devices
+    __slots__ = ("device_id", "notified_alerts", "canceled_alerts",
+                 "cancellation_times", "propagation_set")
+
     def __init__(self, device_id):
         """__init__ method to initialize the device with a device_id."""
         if device_id < 0:
@@ -15,6 +23,8 @@ class Device:
         self.device_id = device_id
         self.notified_alerts = set()
         self.canceled_alerts = set()
+        # the earliest time each description was canceled at this device
+        self.cancellation_times = {}
         self.propagation_set = {}
 
     def __eq__(self, other):
@@ -34,7 +44,15 @@ class Device:
         # add the target device and its delay to the propagation set
         self.propagation_set[target_device] = delay
 
-    def receive_alert(self, alert: Alert, current_time: int, queue: list):
+    def canceled_before(self, description: str, time: int) -> bool:
+        """Check whether the description was canceled at this device
+        before the given time."""
+        cancel_time = self.cancellation_times.get(description)
+        return cancel_time is not None and cancel_time < time
+
+    def receive_alert(
+            self, alert: Alert, current_time: int, queue: list,
+            output: TextOutput | EventLog = _UNBUFFERED_OUTPUT):
         """""Receive an alert and propagate it to other devices."""
         # prevent duplicate alerts
         if (
@@ -44,14 +62,13 @@ class Device:
 
         # If the alert is from another device, print a received message
         if self.device_id != alert.device_id:
-            print(alert.create_receive_alert_message(
-                self.device_id, alert.device_id, current_time
-            ))
+            output.alert_received(
+                alert, self.device_id, alert.device_id, current_time
+            )
 
         # prevent duplicate cancellations
-        for des, _, _, cancel_time in self.canceled_alerts:
-            if des == alert.description and cancel_time < current_time:
-                return
+        if self.canceled_before(alert.description, current_time):
+            return
 
         # Add the alert to the notified alerts
         self.notified_alerts.add(
@@ -64,15 +81,16 @@ class Device:
             new_cancel = Alert(
                 self.device_id, alert.description, propagation_time
             )
-            print(alert.create_send_alert_message(
-                self.device_id, target_device.device_id, current_time
-            ))
+            output.alert_sent(
+                alert, self.device_id, target_device.device_id, current_time
+            )
             queue.append(
                 (propagation_time, "alert", target_device, new_cancel)
             )
 
     def receive_cancellation(
-            self, cancel: Cancellation, current_time: int, queue: list):
+            self, cancel: Cancellation, current_time: int, queue: list,
+            output: TextOutput | EventLog = _UNBUFFERED_OUTPUT):
         """Receive a cancellation and propagate it to other devices."""
         # prevent duplicate cancellations
         if (
@@ -82,19 +100,20 @@ class Device:
 
         # Check if the cancellation is from a different device
         if self.device_id != cancel.device_id:
-            print(cancel.create_receive_cancel_message(
-                self.device_id, cancel.device_id, current_time
-            ))
+            output.cancellation_received(
+                cancel, self.device_id, cancel.device_id, current_time
+            )
 
         # prevent duplicate alerts
-        for des, _, _, cancel_time in self.canceled_alerts:
-            if des == cancel.description and cancel_time < current_time:
-                return
+        if self.canceled_before(cancel.description, current_time):
+            return
 
         # Add the cancellation to the notified cancellations
         self.canceled_alerts.add(
             (cancel.description, cancel.device_id, self.device_id, cancel.time)
         )
+        if not self.canceled_before(cancel.description, cancel.time):
+            self.cancellation_times[cancel.description] = cancel.time
 
         # Propagate the cancellation to other devices
         for target_device, delay in self.propagation_set.items():
@@ -102,9 +121,9 @@ class Device:
             new_cancel = Cancellation(
                 self.device_id, cancel.description, propagation_time
             )
-            print(cancel.create_send_cancel_message(
-                self.device_id, target_device.device_id, current_time
-            ))
+            output.cancellation_sent(
+                cancel, self.device_id, target_device.device_id, current_time
+            )
             queue.append(
                 (propagation_time, "cancellation", target_device, new_cancel)
             )
@@ -2,11 +2,21 @@
 # Evan-Soobin Jeon
 # ejeon2@uci.edu
 import shlex
+import sys
 from alerts import Alert
 from cancellations import Cancellation
 from devices import Device
 
 
+def split_line(line: str) -> list[str]:
+    """Splits a line into its tokens.  Lines without quotes or backslashes,
+    which are nearly all of them, are simply split on whitespace; only the
+    others need shlex to make sense of them."""
+    if '"' in line or "'" in line or "\\" in line:
+        return shlex.split(line)
+    return line.split()
+
+
 def input_command(file_path):
     """Reads the input file and processes commands."""
     devices = {}
@@ -14,12 +24,7 @@ def input_command(file_path):
     simulation_time = int
 
     with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-
-            tokens = shlex.split(line)
+        for tokens in _read_tokens(f):
             command = tokens[0]
 
             if command == "LENGTH":
@@ -29,27 +34,120 @@ def input_command(file_path):
                 device_id = int(tokens[1])
                 devices[device_id] = Device(device_id)
 
-            elif command == "PROPAGATE":
-                sender_id = int(tokens[1])
-                receiver_id = int(tokens[2])
-                delay = tokens[3]
-                events.append(("PROPAGATE", sender_id, receiver_id, delay))
+            else:
+                event = _parse_event(tokens)
+                if event is not None:
+                    events.append(event)
 
-            elif command == "ALERT":
-                device_id = int(tokens[1])
-                description = tokens[2]
-                time = int(tokens[3])
-                alert = Alert(device_id, description, time)
-                events.append(("ALERT", alert))
+    return devices, events, simulation_time
+
+
+def stream_command(file_path):
+    """Reads the length, devices and propagation rules at the start of the
+    input file, returning them along with a generator of the events in the
+    file, which reads the alerts and cancellations that follow only as
+    they're needed.  The alerts and cancellations must be in order of time,
+    and nothing else may follow them."""
+    f = open(file_path, "r", encoding="utf-8")
+    lines = _read_tokens(f)
+    devices = {}
+    propagations = []
+    simulation_time = int
+
+    try:
+        for tokens in lines:
+            command = tokens[0]
+
+            if command == "LENGTH":
+                simulation_time = int(tokens[1])
 
-            elif command == "CANCEL":
+            elif command == "DEVICE":
                 device_id = int(tokens[1])
-                description = tokens[2]
-                time = int(tokens[3])
-                cancellation = Cancellation(device_id, description, time)
-                events.append(("CANCEL", cancellation))
+                devices[device_id] = Device(device_id)
 
             else:
+                event = _parse_event(tokens)
+                if event is None:
+                    continue
+                if event[0] == "PROPAGATE":
+                    propagations.append(event)
+                else:
+                    return devices, _stream_events(
+                        f, lines, propagations, event), simulation_time
+    except BaseException:
+        f.close()
+        raise
+
+    f.close()
+    return devices, iter(propagations), simulation_time
+
+
+def _stream_events(f, lines, propagations, first_event):
+    """Generates the propagation rules, followed by the first event and the
+    rest of the events on the remaining lines, closing the file at the end.
+    Events at the same time are generated alerts first, as the simulation
+    handles them, but otherwise in the order they appear."""
+    with f:
+        yield from propagations
+        group = [first_event]
+        for tokens in lines:
+            event = _parse_event(tokens)
+            if event is None:
+                if tokens[0] in ("LENGTH", "DEVICE"):
+                    raise ValueError(
+                        f"{tokens[0]} must come before every ALERT and CANCEL."
+                    )
                 continue
+            if event[0] == "PROPAGATE":
+                raise ValueError(
+                    "PROPAGATE must come before every ALERT and CANCEL."
+                )
+            if event[1].time < group[0][1].time:
+                raise ValueError("ALERT and CANCEL must be in order of time.")
+            if event[1].time > group[0][1].time:
+                yield from sorted(group, key=_rank)
+                group = []
+            group.append(event)
+        yield from sorted(group, key=_rank)
 
-    return devices, events, simulation_time
+
+def _rank(event):
+    """Events at the same time are handled alerts first"""
+    return 0 if event[0] == "ALERT" else 1
+
+
+def _read_tokens(f):
+    """Generates the tokens of each line of the file
+    that isn't blank or a comment"""
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        yield split_line(line)
+
+
+def _parse_event(tokens):
+    """Returns the event described by a line's tokens,
+    or None if it doesn't describe one.  Descriptions are interned, so every
+    alert and cancellation with the same description shares one string."""
+    command = tokens[0]
+
+    if command == "PROPAGATE":
+        sender_id = int(tokens[1])
+        receiver_id = int(tokens[2])
+        delay = tokens[3]
+        return "PROPAGATE", sender_id, receiver_id, delay
+
+    if command == "ALERT":
+        device_id = int(tokens[1])
+        description = sys.intern(tokens[2])
+        time = int(tokens[3])
+        return "ALERT", Alert(device_id, description, time)
+
+    if command == "CANCEL":
+        device_id = int(tokens[1])
+        description = sys.intern(tokens[2])
+        time = int(tokens[3])
+        return "CANCEL", Cancellation(device_id, description, time)
+
+    return None
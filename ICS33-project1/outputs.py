@@ -0,0 +1,211 @@
+"""outputs.py"""
+# Evan-Soobin Jeon
+# ejeon2@uci.edu
+#
+# Devices report what they send and receive to an output, rather than
+# printing it themselves.  A TextOutput writes the usual messages, but
+# collects them and writes them in large chunks instead of one at a time.
+# An EventLog instead writes each message as a small fixed-size binary
+# record, which read_event_log turns back into the usual messages.
+
+import struct
+import sys
+from alerts import Alert
+from cancellations import Cancellation
+
+# The kinds of records in an event log
+_DESCRIPTION = 0
+_SENT_ALERT = 1
+_RECEIVED_ALERT = 2
+_SENT_CANCELLATION = 3
+_RECEIVED_CANCELLATION = 4
+_END = 5
+
+# Every event log starts with this
+_LOG_HEADER = b"ALOG\x01"
+
+# A record's kind, time, two device ids and description id (so device ids
+# in an event log must be less than 2 ** 32)
+_RECORD = struct.Struct("<BqIII")
+
+# A description record's kind and the length of the description that follows
+_DESCRIPTION_RECORD = struct.Struct("<BI")
+
+# The type of event and the method that creates the message
+# for each kind of record
+_MESSAGES = {
+    _SENT_ALERT: (Alert, Alert.create_send_alert_message),
+    _RECEIVED_ALERT: (Alert, Alert.create_receive_alert_message),
+    _SENT_CANCELLATION: (
+        Cancellation, Cancellation.create_send_cancel_message
+    ),
+    _RECEIVED_CANCELLATION: (
+        Cancellation, Cancellation.create_receive_cancel_message
+    )
+}
+
+
+class TextOutput:
+    """TextOutput class writes the simulation's messages as text."""
+    def __init__(self, file=None, buffer_size: int = 1 << 16):
+        """__init__ method initializes the output to write to the file (or
+        the standard output if there isn't one) whenever the messages
+        collected add up to at least buffer_size characters."""
+        self.file = file
+        self.buffer_size = buffer_size
+        self._lines = []
+        self._size = 0
+
+    def alert_sent(self, alert: Alert, sender_id: int, receiver_id: int,
+                   time: int):
+        """writes a message for an alert that was sent"""
+        self.write(alert.create_send_alert_message(
+            sender_id, receiver_id, time
+        ))
+
+    def alert_received(self, alert: Alert, receiver_id: int, sender_id: int,
+                       time: int):
+        """writes a message for an alert that was received"""
+        self.write(alert.create_receive_alert_message(
+            receiver_id, sender_id, time
+        ))
+
+    def cancellation_sent(self, cancel: Cancellation, sender_id: int,
+                          receiver_id: int, time: int):
+        """writes a message for a cancellation that was sent"""
+        self.write(cancel.create_send_cancel_message(
+            sender_id, receiver_id, time
+        ))
+
+    def cancellation_received(self, cancel: Cancellation, receiver_id: int,
+                              sender_id: int, time: int):
+        """writes a message for a cancellation that was received"""
+        self.write(cancel.create_receive_cancel_message(
+            receiver_id, sender_id, time
+        ))
+
+    def end(self, time: int):
+        """writes the message for the end of the simulation"""
+        self.write(Alert.create_end_message(time))
+
+    def write(self, line: str):
+        """Collect a line, writing the lines collected so far
+        once they're large enough"""
+        self._lines.append(line)
+        self._size += len(line) + 1
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def take(self) -> str | None:
+        """Remove the lines collected so far and return them as one block
+        of text, which can later be written as if it were a line, or return
+        None if there are none"""
+        if not self._lines:
+            return None
+        text = "\n".join(self._lines)
+        self._lines = []
+        self._size = 0
+        return text
+
+    def flush(self):
+        """Write every line collected so far"""
+        if self._lines:
+            file = sys.stdout if self.file is None else self.file
+            file.write("\n".join(self._lines) + "\n")
+            self._lines = []
+            self._size = 0
+
+
+class EventLog:
+    """EventLog class writes the simulation's messages
+    as binary records to a file opened for writing bytes."""
+    def __init__(self, file, buffer_size: int = 1 << 16):
+        """__init__ method initializes the log to write to the file whenever
+        the records collected add up to at least buffer_size bytes."""
+        self.file = file
+        self.buffer_size = buffer_size
+        self._buffer = bytearray(_LOG_HEADER)
+        self._description_ids = {}
+
+    def alert_sent(self, alert: Alert, sender_id: int, receiver_id: int,
+                   time: int):
+        """records an alert that was sent"""
+        self._record(_SENT_ALERT, time, sender_id, receiver_id, alert)
+
+    def alert_received(self, alert: Alert, receiver_id: int, sender_id: int,
+                       time: int):
+        """records an alert that was received"""
+        self._record(_RECEIVED_ALERT, time, receiver_id, sender_id, alert)
+
+    def cancellation_sent(self, cancel: Cancellation, sender_id: int,
+                          receiver_id: int, time: int):
+        """records a cancellation that was sent"""
+        self._record(_SENT_CANCELLATION, time, sender_id, receiver_id, cancel)
+
+    def cancellation_received(self, cancel: Cancellation, receiver_id: int,
+                              sender_id: int, time: int):
+        """records a cancellation that was received"""
+        self._record(
+            _RECEIVED_CANCELLATION, time, receiver_id, sender_id, cancel
+        )
+
+    def end(self, time: int):
+        """records the end of the simulation"""
+        self._buffer += _RECORD.pack(_END, time, 0, 0, 0)
+
+    def _record(self, kind: int, time: int, first_id: int, second_id: int,
+                event):
+        """Collect a record, along with a record of its description
+        if it's the first to have it"""
+        description_id = self._description_ids.get(event.description)
+        if description_id is None:
+            description_id = len(self._description_ids)
+            self._description_ids[event.description] = description_id
+            encoded = event.description.encode("utf-8")
+            self._buffer += _DESCRIPTION_RECORD.pack(
+                _DESCRIPTION, len(encoded)
+            )
+            self._buffer += encoded
+        self._buffer += _RECORD.pack(
+            kind, time, first_id, second_id, description_id
+        )
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write every record collected so far"""
+        if self._buffer:
+            self.file.write(self._buffer)
+            self._buffer = bytearray()
+
+
+def read_event_log(data: bytes):
+    """Generates the messages recorded in an event log's bytes"""
+    if data[:len(_LOG_HEADER)] != _LOG_HEADER:
+        raise ValueError("not an event log.")
+    descriptions = []
+    offset = len(_LOG_HEADER)
+    while offset < len(data):
+        if data[offset] == _DESCRIPTION:
+            _, length = _DESCRIPTION_RECORD.unpack_from(data, offset)
+            offset += _DESCRIPTION_RECORD.size
+            descriptions.append(
+                bytes(data[offset:offset + length]).decode("utf-8")
+            )
+            offset += length
+            continue
+
+        kind, time, first_id, second_id, description_id = (
+            _RECORD.unpack_from(data, offset)
+        )
+        offset += _RECORD.size
+        if kind == _END:
+            yield Alert.create_end_message(time)
+            continue
+
+        if kind not in _MESSAGES:
+            raise ValueError(f"unknown record kind {kind}.")
+        event_type, create_message = _MESSAGES[kind]
+        event = event_type(first_id, descriptions[description_id], time)
+        yield create_message(event, first_id, second_id, time)
+
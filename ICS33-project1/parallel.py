@@ -0,0 +1,235 @@
+"""parallel.py"""
+# Evan-Soobin Jeon
+# ejeon2@uci.edu
+#
+# Runs a simulation with its devices split among several processes, each of
+# which keeps its own devices' pending events and writes their messages.
+# Nothing a device sends arrives sooner than the shortest propagation delay,
+# so once a window of time that long begins, every event in it is already
+# pending somewhere, and nothing that happens in it can change it.  Each
+# process handles the events at its own devices in the window while the
+# others do the same, keeping what its devices send each other, and passing
+# on only what they send to other processes' devices.
+#
+# A single process would handle events in order of time, then alerts before
+# cancellations, then the order they were scheduled in: the alerts and
+# cancellations in the input file first, then each event sent in the order
+# the events that sent them were handled.  So each event is identified by
+# its time, its rank, and either (-1, its place in the input file, 0) or
+# (the window in which the event that sent it was handled, where that event
+# came in that window's order, where it came among the events sent at once).
+# Each process writes the messages for each of its events in a window as
+# a block of text; merging the blocks in the order of their events gives
+# that window's messages in order, and the places the events came in.
+
+import heapq
+import math
+from multiprocessing import Pipe, Process
+from devices import Device
+from outputs import TextOutput
+from scheduler import Scheduler
+
+# Events at the same time are handled alerts first, then cancellations.
+_RANKS = {"alert": 0, "cancellation": 1}
+
+
+def lookahead(devices) -> int | None:
+    """Returns the shortest propagation delay from any of the devices,
+    or None if none of them propagate anything"""
+    return min(
+        (delay
+         for device in devices
+         for delay in device.propagation_set.values()),
+        default=None
+    )
+
+
+def simulate_parallel(
+        devices: dict, queue: Scheduler, output: TextOutput,
+        processes: int) -> None:
+    """Runs the alerts and cancellations in the queue, and everything they
+    cause, with the devices split among the given number of processes,
+    writing the messages to the given output.  The devices' shortest
+    propagation delay must be positive."""
+    window = lookahead(devices.values())
+    if not window:
+        raise ValueError("propagation delays must be positive.")
+
+    # Neighboring ids are often neighboring devices, so the devices are
+    # split into runs of ids, keeping more of what they send in one process.
+    device_ids = sorted(devices)
+    size = -(-len(device_ids) // processes)
+    partitions = [
+        device_ids[start:start + size]
+        for start in range(0, len(device_ids), size)
+    ]
+    owners = {
+        device_id: partition
+        for partition, partition_ids in enumerate(partitions)
+        for device_id in partition_ids
+    }
+
+    connections = []
+    workers = []
+    try:
+        for partition, partition_ids in enumerate(partitions):
+            rules = [
+                (device_id, target.device_id, delay)
+                for device_id in partition_ids
+                for target, delay in devices[device_id].propagation_set.items()
+            ]
+            connection, worker_connection = Pipe()
+            worker = Process(
+                target=_serve_partition,
+                args=(worker_connection, partition, partition_ids, rules,
+                      queue.horizon),
+                daemon=True
+            )
+            worker.start()
+            connections.append(connection)
+            workers.append(worker)
+
+        next_times = [None] * len(partitions)
+        in_flight = [[] for _ in partitions]
+        places = [[] for _ in partitions]
+        arrival_count = 0
+        window_number = 0
+        while True:
+            times = [time for time in next_times if time is not None]
+            times.extend(
+                event[0] for events in in_flight for event in events
+            )
+            if queue:
+                times.append(queue.peek()[0])
+            if not times:
+                break
+            end = min(times) + window
+
+            arrivals, in_flight = in_flight, [[] for _ in partitions]
+            while queue and queue.peek()[0] < end:
+                time, event_type, device, event = queue.pop()
+                arrivals[owners[device.device_id]].append((
+                    time, _RANKS[event_type], -1, arrival_count, 0,
+                    device.device_id, event
+                ))
+                arrival_count += 1
+
+            for connection, partition_places, partition_arrivals in zip(
+                    connections, places, arrivals):
+                connection.send(
+                    (window_number - 1, partition_places, partition_arrivals,
+                     end)
+                )
+            replies = [connection.recv() for connection in connections]
+            for reply in replies:
+                if isinstance(reply, Exception):
+                    raise reply
+
+            places = [[] for _ in partitions]
+            for place, (_, partition, text) in enumerate(
+                    heapq.merge(*(blocks for blocks, _, _ in replies))):
+                output.write(text)
+                places[partition].append(place)
+
+            for partition, (_, sent, next_time) in enumerate(replies):
+                next_times[partition] = next_time
+                partition_places = places[partition]
+                for time, rank, sender, order, device_id, event in sent:
+                    in_flight[owners[device_id]].append((
+                        time, rank, window_number, partition_places[sender],
+                        order, device_id, event
+                    ))
+            window_number += 1
+    finally:
+        for connection in connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.join()
+
+
+def _serve_partition(
+        connection, partition: int, device_ids: list[int],
+        rules: list[tuple], horizon: int | None):
+    """Handles the events at the given devices, one window at a time, until
+    the connection sends None.  For each window, the connection sends the
+    previous window's number and the places in its order of this partition's
+    events in it, the events sent here from other partitions, and the end of
+    the window; a block of messages for each event handled in the window,
+    the events sent to other partitions, and the time of the next event
+    pending here (or None) are sent back."""
+    devices = {device_id: Device(device_id) for device_id in device_ids}
+    for sender_id, receiver_id, delay in rules:
+        if receiver_id not in devices:
+            # stands in for a device in another partition
+            devices[receiver_id] = Device(receiver_id)
+        devices[sender_id].add_propagation_set(devices[receiver_id], delay)
+    owned = set(device_ids)
+
+    pending = []
+    unplaced = []
+    sent = []
+    # the messages are only ever taken from the output, a block at a time,
+    # so it must never write them anywhere itself
+    output = TextOutput(buffer_size=math.inf)
+    while (command := connection.recv()) is not None:
+        try:
+            previous_window, places, arrivals, end = command
+            # the events sent within this partition last window can be
+            # identified now that their senders' places are known
+            for time, rank, sender, order, device, event in unplaced:
+                heapq.heappush(pending, (
+                    time, rank, previous_window, places[sender], order,
+                    device, event
+                ))
+            for time, rank, window, place, order, device_id, event in (
+                    arrivals):
+                heapq.heappush(pending, (
+                    time, rank, window, place, order, devices[device_id],
+                    event
+                ))
+
+            blocks = []
+            unplaced = []
+            sent_away = []
+            while pending and pending[0][0] < end:
+                entry = heapq.heappop(pending)
+                time, rank, _, _, _, device, event = entry
+                sent.clear()
+                if rank == 0:
+                    device.receive_alert(event, time, sent, output)
+                else:
+                    device.receive_cancellation(event, time, sent, output)
+                text = output.take()
+                if text is None:
+                    # an event that writes nothing sends nothing either
+                    continue
+
+                sender = len(blocks)
+                blocks.append((entry[:5], partition, text))
+                for order, (sent_time, event_type, target, sent_event) in (
+                        enumerate(sent)):
+                    if horizon is not None and sent_time > horizon:
+                        continue
+                    if target.device_id in owned:
+                        unplaced.append((
+                            sent_time, _RANKS[event_type], sender, order,
+                            target, sent_event
+                        ))
+                    else:
+                        sent_away.append((
+                            sent_time, _RANKS[event_type], sender, order,
+                            target.device_id, sent_event
+                        ))
+
+            next_time = min(
+                ([pending[0][0]] if pending else [])
+                + [event[0] for event in unplaced],
+                default=None
+            )
+        except Exception as error:
+            connection.send(error)
+            return
+        connection.send((blocks, sent_away, next_time))
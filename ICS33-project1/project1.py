@@ -3,8 +3,10 @@
 # ejeon2@uci.edu
 
 from pathlib import Path
-from inputs import input_command
-from alerts import Alert
+from inputs import input_command, stream_command
+from outputs import TextOutput
+from parallel import lookahead, simulate_parallel
+from scheduler import Scheduler
 
 
 def read_input_file_path() -> Path:
@@ -14,49 +16,82 @@ def read_input_file_path() -> Path:
 
 def main() -> None:
     """Runs the simulation program in its entirety"""
-    input_file_path = read_input_file_path()
-
+    simulate_file(read_input_file_path())
+
+
+def simulate_file(
+        input_file_path: Path, output=None, streaming: bool = False,
+        processes: int = 1) -> None:
+    """Runs the simulation described by the given input file, writing its
+    output to the given output (or printing it, if there isn't one).  When
+    streaming, the input file's alerts and cancellations are read only as
+    the simulation reaches them, which needs them to be in order of time.
+    Given more than one process, the devices are split among them, unless
+    some propagation delay is zero, which leaves them nothing to share, or
+    the output is an event log, whose descriptions are numbered in the order
+    the whole simulation first writes them."""
     if not input_file_path.exists():
         print("FILE NOT FOUND")
         return
 
-    devices, events, simulation_time = input_command(str(input_file_path))
-    queue = []
-
-    for event in events:
-        if event[0] == "PROPAGATE":
-            _, sender_id, receiver_id, delay = event
-            sender = devices[sender_id]
-            receiver = devices[receiver_id]
-            sender.add_propagation_set(receiver, int(delay))
-
-        if event[0] == "ALERT":
-            _, alert = event
-            device = devices[alert.device_id]
-            queue.append((alert.time, "alert", device, alert))
-
-        if event[0] == "CANCEL":
-            _, cancellation = event
-            device = devices[cancellation.device_id]
-            queue.append(
-                (cancellation.time, "cancellation", device, cancellation)
-            )
-
-        queue.sort(key=lambda x: (x[0], 0 if x[1] == "alert" else 1))
+    read = stream_command if streaming else input_command
+    devices, events, simulation_time = read(str(input_file_path))
+    if output is None:
+        output = TextOutput()
+    # nothing after the end of the simulation is ever scheduled
+    horizon = simulation_time if isinstance(simulation_time, int) else None
+    arrivals = _arrivals(devices, events)
+
+    if streaming:
+        queue = Scheduler(horizon, arrivals)
+    else:
+        queue = Scheduler(horizon)
+        for arrival in arrivals:
+            queue.append(arrival)
 
     # Run Simulation
+    if (processes > 1 and isinstance(output, TextOutput)
+            and lookahead(devices.values())):
+        simulate_parallel(devices, queue, output, processes)
+
     while queue:
-        current_time, event_type, device, event = queue.pop(0)
+        current_time, event_type, device, event = queue.pop()
 
         if event_type == "alert":
-            device.receive_alert(event, current_time, queue)
+            device.receive_alert(event, current_time, queue, output)
 
         if event_type == "cancellation":
-            device.receive_cancellation(event, current_time, queue)
-
-        queue.sort(key=lambda x: (x[0], 0 if x[1] == "alert" else 1))
-
-    print(Alert.create_end_message(simulation_time))
+            device.receive_cancellation(event, current_time, queue, output)
+
+    output.end(simulation_time)
+    output.flush()
+
+
+def _arrivals(devices, events):
+    """Generates the alerts and cancellations among the events as they're
+    scheduled, adding the propagation rules to the devices along the way"""
+    try:
+        for event in events:
+            if event[0] == "PROPAGATE":
+                _, sender_id, receiver_id, delay = event
+                sender = devices[sender_id]
+                receiver = devices[receiver_id]
+                sender.add_propagation_set(receiver, int(delay))
+
+            if event[0] == "ALERT":
+                _, alert = event
+                device = devices[alert.device_id]
+                yield alert.time, "alert", device, alert
+
+            if event[0] == "CANCEL":
+                _, cancellation = event
+                device = devices[cancellation.device_id]
+                yield cancellation.time, "cancellation", device, cancellation
+    finally:
+        # a streamed input file the simulation ends before finishing
+        # is closed now, rather than whenever it's collected
+        if hasattr(events, "close"):
+            events.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,100 @@
+"""scheduler.py"""
+# Evan-Soobin Jeon
+# ejeon2@uci.edu
+
+import heapq
+from collections.abc import Iterable
+
+# Events at the same time are handled alerts first, then cancellations.
+_RANKS = {"alert": 0, "cancellation": 1}
+_EVENT_TYPES = ("alert", "cancellation")
+
+
+class Scheduler:
+    """Scheduler class holds the simulation's pending events in a heap,
+    handing them out in the order they happen."""
+    def __init__(
+            self, horizon: int | None = None,
+            arrivals: Iterable[tuple] = ()):
+        """__init__ method initializes the scheduler with no events.  Events
+        after the horizon, if there is one, are never scheduled, since the
+        simulation ends before they would happen.
+
+        Arrivals are events already in the order they happen, which are
+        taken one at a time only when they're next, rather than all being
+        scheduled up front.  They come before any scheduled events at the
+        same time and of the same type, as they would if they'd been
+        scheduled first."""
+        self._heap = []
+        self._count = 0
+        self.horizon = horizon
+        self._arrivals = iter(arrivals)
+        self._next_arrival = None
+        self._take_arrival()
+
+    def __len__(self):
+        """__len__ method returns the number of pending events that have
+        been scheduled, not counting arrivals that haven't been taken yet."""
+        return len(self._heap)
+
+    def __bool__(self):
+        """__bool__ method returns True if any events are still pending."""
+        return bool(self._heap) or self._next_arrival is not None
+
+    def _take_arrival(self):
+        """Take the next arrival, if there is one before the horizon."""
+        self._next_arrival = next(self._arrivals, None)
+        if (self._next_arrival is not None and self.horizon is not None
+                and self._next_arrival[0] > self.horizon):
+            # the rest happen even later, so they needn't be read at all
+            self._next_arrival = None
+            if hasattr(self._arrivals, "close"):
+                self._arrivals.close()
+
+    def append(self, event: tuple):
+        """Schedule an event, given as a (time, event type, device, alert or
+        cancellation) tuple.  Like a list, so devices can add the events they
+        cause to either one.  Events after the horizon are dropped."""
+        if self.horizon is not None and event[0] > self.horizon:
+            return
+        # Events at the same time and of the same type are handed out in the
+        # order they were scheduled, which the count keeps track of.  The
+        # event's device and alert or cancellation are kept in the same
+        # tuple, rather than the event being wrapped in another, so a pending
+        # event takes one tuple rather than two.  In exchange, the caller's
+        # tuple is discarded here and pop() builds a new one, but short-lived
+        # tuples are cheap to make, and the heap is never larger.
+        time, event_type, device, message = event
+        heapq.heappush(
+            self._heap,
+            (time, _RANKS[event_type], self._count, device, message)
+        )
+        self._count += 1
+
+    def peek(self) -> tuple:
+        """Return the next event to happen, without removing it."""
+        if self._arrival_is_next():
+            return self._next_arrival
+        return _unpack(self._heap[0])
+
+    def pop(self) -> tuple:
+        """Remove and return the next event to happen."""
+        if self._arrival_is_next():
+            arrival = self._next_arrival
+            self._take_arrival()
+            return arrival
+        return _unpack(heapq.heappop(self._heap))
+
+    def _arrival_is_next(self) -> bool:
+        """Return True if the next arrival happens before every scheduled
+        event, or at the same time as the first and of the same type."""
+        arrival = self._next_arrival
+        return arrival is not None and (
+            not self._heap
+            or (arrival[0], _RANKS[arrival[1]]) <= self._heap[0][:2])
+
+
+def _unpack(entry: tuple) -> tuple:
+    """Return the event stored in a heap entry."""
+    time, rank, _, device, message = entry
+    return time, _EVENT_TYPES[rank], device, message
@@ -6,14 +6,20 @@ import unittest
 from contextlib import redirect_stdout, contextmanager
 import tempfile
 import os
+import gc
+import warnings
 import sys
 from pathlib import Path
 from io import StringIO
 from alerts import Alert
 from cancellations import Cancellation
 from devices import Device
-from inputs import input_command
-from project1 import read_input_file_path, main
+from inputs import input_command, stream_command, split_line
+from project1 import read_input_file_path, main, simulate_file
+from batch import find_input_files, run_batch
+from scheduler import Scheduler
+from outputs import TextOutput, EventLog, read_event_log
+from parallel import lookahead
 # coverage report -m (shows report with percent)
 # coverage run -m --branch pytest . (branch coverage)
 
@@ -242,6 +248,13 @@ class TestDevices(unittest.TestCase):
             )
         self.assertIn("must be non-negative", str(context2.exception))
 
+    def test_events_and_devices_have_no_instance_dictionary(self):
+        """test that alerts, cancellations and devices use __slots__"""
+        for value in [
+                Alert(1, "OhNo", 100), Cancellation(1, "OhNo", 100),
+                Device(1)]:
+            self.assertFalse(hasattr(value, "__dict__"))
+
     def test_receive_alert_prevent_duplicate_success(self):
         """test the receive_alert method"""
         device = Device(1)
@@ -294,6 +307,36 @@ class TestDevices(unittest.TestCase):
         device.receive_cancellation(cancel, 100, queue)
         self.assertNotEqual(len(queue), 1)
 
+    def test_canceled_before_uses_earliest_cancellation(self):
+        """test that canceled_before compares against the earliest
+        cancellation of a description"""
+        device = Device(1)
+        queue = []
+        with redirect_stdout(StringIO()):
+            device.receive_cancellation(
+                Cancellation(1, "OhNo", 300), 300, queue)
+            device.receive_cancellation(
+                Cancellation(1, "OhNo", 200), 200, queue)
+        self.assertEqual(device.cancellation_times, {"OhNo": 200})
+        self.assertTrue(device.canceled_before("OhNo", 250))
+        self.assertFalse(device.canceled_before("OhNo", 200))
+        self.assertFalse(device.canceled_before("Other", 1000))
+
+    def test_receive_alert_after_cancellation_not_propagated(self):
+        """test that an alert arriving after its cancellation
+        is received but not sent on"""
+        device = Device(2)
+        device.add_propagation_set(Device(3), 10)
+        queue = []
+        with redirect_stdout(StringIO()) as output:
+            device.receive_cancellation(
+                Cancellation(1, "OhNo", 100), 100, queue)
+            queue.clear()
+            device.receive_alert(Alert(1, "OhNo", 150), 150, queue)
+        self.assertEqual(queue, [])
+        self.assertTrue(output.getvalue().endswith(
+            "@150: #2 RECEIVED ALERT FROM #1: OhNo\n"))
+
 
 class TestInputs(unittest.TestCase):
     """Test cases for the input_command function"""
@@ -467,6 +510,101 @@ class TestInputs(unittest.TestCase):
         self.assertNotIsInstance(devices[1], str)
         self.assertNotIsInstance(devices[2], str)
 
+    def test_split_line_success(self):
+        """Test that lines are split on whitespace,
+        and quoted tokens are kept together"""
+        self.assertEqual(
+            split_line("ALERT 1  OhNo\t5000"), ["ALERT", "1", "OhNo", "5000"])
+        self.assertEqual(
+            split_line('ALERT 1 "Oh No" 5000'),
+            ["ALERT", "1", "Oh No", "5000"])
+
+    def test_stream_command_success(self):
+        """Test that stream_command reads the same events as input_command,
+        with alerts before cancellations at the same time"""
+        with tempfile.NamedTemporaryFile(
+                mode='w+', delete=False, encoding='utf-8') as temp_file:
+            temp_file.write(
+                "LENGTH 9000\n"
+                "DEVICE 1\n"
+                "DEVICE 2\n"
+                "PROPAGATE 1 2 100\n"
+                "CANCEL 1 OhNo 5000\n"
+                "ALERT 2 OhNo 5000\n"
+                "# a comment\n"
+                "ALERT 1 Uh-oh 6000\n"
+            )
+            temp_file_path = temp_file.name
+
+        try:
+            devices, events, simulation_time = stream_command(temp_file_path)
+            events = list(events)
+        finally:
+            os.remove(temp_file_path)
+
+        self.assertEqual(simulation_time, 9000)
+        self.assertEqual(sorted(devices), [1, 2])
+        self.assertEqual(events[0], ("PROPAGATE", 1, 2, "100"))
+        self.assertEqual(
+            [(event[0], event[1].device_id) for event in events[1:]],
+            [("ALERT", 2), ("CANCEL", 1), ("ALERT", 1)])
+
+    def test_stream_command_failure(self):
+        """Test that stream_command rejects events out of order of time,
+        and propagation rules after the events"""
+        for lines in [
+                "ALERT 1 OhNo 5000\nALERT 1 OhNo 4000\n",
+                "ALERT 1 OhNo 5000\nPROPAGATE 1 1 100\n"]:
+            with tempfile.NamedTemporaryFile(
+                    mode='w+', delete=False, encoding='utf-8') as temp_file:
+                temp_file.write("LENGTH 9000\nDEVICE 1\n" + lines)
+                temp_file_path = temp_file.name
+
+            try:
+                _, events, _ = stream_command(temp_file_path)
+                with self.assertRaises(ValueError):
+                    list(events)
+            finally:
+                os.remove(temp_file_path)
+
+    def test_stream_command_closes_file_on_failure(self):
+        """Test that stream_command closes the input file
+        when its first lines can't be read"""
+        with tempfile.NamedTemporaryFile(
+                mode='w+', delete=False, encoding='utf-8') as temp_file:
+            temp_file.write("LENGTH soon\nDEVICE 1\n")
+            temp_file_path = temp_file.name
+
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", ResourceWarning)
+                with self.assertRaises(ValueError):
+                    stream_command(temp_file_path)
+                gc.collect()
+        finally:
+            os.remove(temp_file_path)
+
+        self.assertEqual(
+            [w for w in caught if issubclass(w.category, ResourceWarning)],
+            [])
+
+    def test_descriptions_interned_success(self):
+        """Test that events with the same description share one string"""
+        with tempfile.NamedTemporaryFile(
+                mode='w+', delete=False, encoding='utf-8') as temp_file:
+            temp_file.write(
+                "DEVICE 1\n"
+                "ALERT 1 OhNo 5000\n"
+                "CANCEL 1 OhNo 6000\n"
+            )
+            temp_file_path = temp_file.name
+
+        _, events, _ = input_command(temp_file_path)
+
+        os.remove(temp_file_path)
+
+        self.assertIs(events[0][1].description, events[1][1].description)
+
 
 @contextmanager
 def redirect_stdin(new_stdin):
@@ -570,6 +708,52 @@ class TestProject1(unittest.TestCase):
         finally:
             os.remove(temp_file_path)
 
+    def test_simulate_file_streaming_success(self):
+        """Test that streaming the input file gives the same output"""
+        sample = Path(__file__).parent.parent / "sample_input.txt"
+        outputs = []
+        for streaming in [False, True]:
+            with redirect_stdout(StringIO()) as output:
+                simulate_file(sample, streaming=streaming)
+            outputs.append(output.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_project1_main_stops_at_length(self):
+        """Test that a never-canceled alert circling between two devices
+        stops at the end of the simulation"""
+        test_input = (
+            "LENGTH 250\n"
+            "DEVICE 1\n"
+            "DEVICE 2\n"
+            "PROPAGATE 1 2 100\n"
+            "PROPAGATE 2 1 100\n"
+            "ALERT 1 Badness 0\n"
+        )
+
+        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as temp_file:
+            temp_file.write(test_input)
+            temp_file_path = temp_file.name
+
+        try:
+            with redirect_stdin(StringIO(f"{temp_file_path}\n")), \
+                    redirect_stdout(StringIO()) as output:
+                main()
+                output_value = output.getvalue().strip().replace("\r\n", "\n")
+
+            expected_output = (
+                "@0: #1 SENT ALERT TO #2: Badness\n"
+                "@100: #2 RECEIVED ALERT FROM #1: Badness\n"
+                "@100: #2 SENT ALERT TO #1: Badness\n"
+                "@200: #1 RECEIVED ALERT FROM #2: Badness\n"
+                "@200: #1 SENT ALERT TO #2: Badness\n"
+                "@250: END"
+            )
+
+            self.assertEqual(output_value, expected_output)
+
+        finally:
+            os.remove(temp_file_path)
+
     def test_project1_main_failure(self):
         """Test the main function with an invalid output (failure)"""
         test_input = (
@@ -600,5 +784,354 @@ class TestProject1(unittest.TestCase):
             os.remove(temp_file_path)
 
 
+class TestBatch(unittest.TestCase):
+    """Test cases for the batch module"""
+    scenario = (
+        "LENGTH 900\n"
+        "DEVICE 1\n"
+        "DEVICE 2\n"
+        "PROPAGATE 1 2 100\n"
+        "PROPAGATE 2 1 100\n"
+        "ALERT 1 Badness 200\n"
+        "CANCEL 1 Badness 450\n"
+    )
+
+    def test_find_input_files_in_directory(self):
+        """test that every .txt file in a directory is found"""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            for name in ["b.txt", "a.txt", "notes.md"]:
+                (directory / name).write_text(self.scenario)
+            self.assertEqual(
+                find_input_files(directory),
+                [directory / "a.txt", directory / "b.txt"]
+            )
+
+    def test_find_input_files_in_manifest(self):
+        """test that the files listed in a manifest are found,
+        relative to the manifest"""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            manifest = directory / "manifest"
+            manifest.write_text("# nightly\nfirst.txt\n\nsub/second.txt\n")
+            self.assertEqual(
+                find_input_files(manifest),
+                [directory / "first.txt", directory / "sub" / "second.txt"]
+            )
+
+    def test_run_batch_writes_each_output_success(self):
+        """test that each simulation's output is written to its own file,
+        matching the output of main"""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / "one.txt").write_text(self.scenario)
+            (directory / "two.txt").write_text(
+                self.scenario.replace("LENGTH 900", "LENGTH 1000"))
+            report = run_batch(
+                find_input_files(directory), directory / "out", processes=2)
+
+            with redirect_stdin(StringIO(f"{directory / 'one.txt'}\n")), \
+                    redirect_stdout(StringIO()) as output:
+                main()
+
+            self.assertEqual(
+                (directory / "out" / "one.out").read_text(),
+                output.getvalue()
+            )
+            self.assertTrue(
+                (directory / "out" / "two.out").read_text().endswith(
+                    "@1000: END\n"))
+            self.assertEqual(len(report.timings), 2)
+            self.assertEqual(report.failures, {})
+            self.assertIn("FILES: 2", str(report))
+
+    def test_run_batch_records_failures(self):
+        """test that a file that can't be simulated is reported as a failure
+        without stopping the batch"""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / "good.txt").write_text(self.scenario)
+            (directory / "bad.txt").write_text("LENGTH soon\n")
+            report = run_batch(
+                find_input_files(directory), directory / "out", processes=1)
+            self.assertEqual(
+                list(report.failures), [str(directory / "bad.txt")])
+            self.assertIn("FAILED: 1", str(report))
+
+    def test_run_batch_records_missing_files(self):
+        """test that an input file that doesn't exist is reported
+        as a failure, and no output is written for it"""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / "good.txt").write_text(self.scenario)
+            report = run_batch(
+                [directory / "good.txt", directory / "missing.txt"],
+                directory / "out", processes=1)
+            self.assertEqual(
+                list(report.failures), [str(directory / "missing.txt")])
+            self.assertFalse((directory / "out" / "missing.out").exists())
+            self.assertIn("FAILED: 1", str(report))
+
+    def test_run_batch_failure_same_names(self):
+        """test that input files whose outputs would collide are rejected"""
+        with self.assertRaises(ValueError):
+            run_batch([Path("a/x.txt"), Path("b/x.txt")], Path("out"))
+
+
+class TestScheduler(unittest.TestCase):
+    """Test cases for the Scheduler class"""
+    def test_scheduler_pops_in_time_order(self):
+        """test that events are handed out earliest first"""
+        queue = Scheduler()
+        for time in [300, 100, 200]:
+            queue.append((time, "alert", None, None))
+        self.assertEqual(
+            [queue.pop()[0] for _ in range(len(queue))], [100, 200, 300])
+        self.assertFalse(queue)
+
+    def test_scheduler_alert_before_cancellation(self):
+        """test that an alert comes before a cancellation at the same time,
+        whichever was scheduled first"""
+        queue = Scheduler()
+        queue.append((100, "cancellation", None, "cancel"))
+        queue.append((100, "alert", None, "alert"))
+        self.assertEqual(queue.pop()[3], "alert")
+        self.assertEqual(queue.pop()[3], "cancel")
+
+    def test_scheduler_ties_in_scheduled_order(self):
+        """test that events at the same time and of the same type
+        are handed out in the order they were scheduled"""
+        queue = Scheduler()
+        devices = [Device(3), Device(1), Device(2)]
+        for device in devices:
+            queue.append((100, "alert", device, Alert(1, "OhNo", 100)))
+        self.assertEqual([queue.pop()[2] for _ in range(3)], devices)
+
+    def test_scheduler_drops_events_after_horizon(self):
+        """test that events after the horizon are never scheduled"""
+        queue = Scheduler(horizon=200)
+        for time in [100, 200, 201]:
+            queue.append((time, "alert", None, None))
+        self.assertEqual(len(queue), 2)
+        self.assertEqual([queue.pop()[0], queue.pop()[0]], [100, 200])
+
+    def test_scheduler_arrivals_before_scheduled_ties(self):
+        """test that arrivals are merged with the scheduled events,
+        coming first among events at the same time and of the same type"""
+        arrivals = iter([
+            (100, "alert", None, "first"),
+            (200, "cancellation", None, "arrived"),
+            (300, "alert", None, "late")])
+        queue = Scheduler(horizon=250, arrivals=arrivals)
+        queue.append((200, "alert", None, "alert"))
+        queue.append((200, "cancellation", None, "scheduled"))
+        self.assertEqual(
+            [queue.pop()[3] for _ in range(4)],
+            ["first", "alert", "arrived", "scheduled"])
+        self.assertFalse(queue)
+
+    def test_scheduler_closes_arrivals_past_horizon(self):
+        """test that arrivals are closed once they pass the horizon,
+        without reading the rest of them"""
+        read = []
+
+        def arrivals():
+            for time in [100, 300, 400]:
+                read.append(time)
+                yield (time, "alert", None, None)
+
+        generator = arrivals()
+        queue = Scheduler(horizon=200, arrivals=generator)
+        self.assertEqual(queue.pop()[0], 100)
+        self.assertFalse(queue)
+        self.assertEqual(read, [100, 300])
+        self.assertIsNone(generator.gi_frame)
+
+    def test_device_schedules_into_scheduler(self):
+        """test that a device can schedule the alerts it sends
+        into a scheduler"""
+        queue = Scheduler()
+        device = Device(1)
+        device.add_propagation_set(Device(2), 50)
+        with redirect_stdout(StringIO()):
+            device.receive_alert(Alert(1, "OhNo", 100), 100, queue)
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.pop()[0], 150)
+
+
+class TestOutputs(unittest.TestCase):
+    """Test cases for the outputs module"""
+    scenario = TestBatch.scenario
+
+    def test_text_output_buffers_until_flush(self):
+        """test that messages are written only when flushed
+        or when enough have been collected"""
+        file = StringIO()
+        output = TextOutput(file, buffer_size=60)
+        alert = Alert(1, "OhNo", 100)
+        output.alert_sent(alert, 1, 2, 100)
+        self.assertEqual(file.getvalue(), "")
+        output.alert_received(alert, 2, 1, 150)
+        self.assertEqual(
+            file.getvalue(),
+            "@100: #1 SENT ALERT TO #2: OhNo\n"
+            "@150: #2 RECEIVED ALERT FROM #1: OhNo\n"
+        )
+        output.end(200)
+        output.flush()
+        self.assertTrue(file.getvalue().endswith("@200: END\n"))
+
+    def test_event_log_matches_text_output(self):
+        """test that an event log holds the same messages
+        as the text output of the same simulation"""
+        with tempfile.TemporaryDirectory() as directory:
+            input_file = Path(directory) / "scenario.txt"
+            input_file.write_text(self.scenario)
+
+            text = StringIO()
+            output = TextOutput(text)
+            simulate_file(input_file, output)
+
+            log = tempfile.TemporaryFile()
+            with log:
+                simulate_file(input_file, EventLog(log))
+                log.seek(0)
+                data = log.read()
+
+        self.assertEqual(
+            "\n".join(read_event_log(data)) + "\n", text.getvalue())
+
+    def test_event_log_stores_each_description_once(self):
+        """test that a description is written to the log only once"""
+        file = tempfile.TemporaryFile()
+        with file:
+            output = EventLog(file)
+            cancel = Cancellation(3, "a rather long description", 10)
+            for time in range(10, 20):
+                output.cancellation_sent(cancel, 3, 4, time)
+            output.flush()
+            file.seek(0)
+            data = file.read()
+        self.assertEqual(data.count(b"a rather long description"), 1)
+        self.assertEqual(
+            list(read_event_log(data))[-1],
+            "@19: #3 SENT CANCELLATION TO #4: a rather long description"
+        )
+
+    def test_read_event_log_failure(self):
+        """test that data that isn't an event log is rejected"""
+        with self.assertRaises(ValueError):
+            list(read_event_log(b"@0: END"))
+
+    def test_run_batch_writes_event_logs(self):
+        """test that a batch can write event logs instead of text"""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / "one.txt").write_text(self.scenario)
+            run_batch(
+                [directory / "one.txt"], directory / "out", processes=1,
+                event_log=True
+            )
+            messages = list(read_event_log(
+                (directory / "out" / "one.log").read_bytes()))
+        self.assertEqual(messages[0], "@200: #1 SENT ALERT TO #2: Badness")
+        self.assertEqual(messages[-1], "@900: END")
+
+
+class TestParallel(unittest.TestCase):
+    """Test cases for the parallel module"""
+    def test_lookahead_is_shortest_delay(self):
+        """test that the lookahead is the shortest propagation delay,
+        or None when nothing propagates"""
+        devices = [Device(1), Device(2), Device(3)]
+        self.assertIsNone(lookahead(devices))
+        devices[0].add_propagation_set(devices[1], 300)
+        devices[1].add_propagation_set(devices[2], 75)
+        self.assertEqual(lookahead(devices), 75)
+
+    def test_simulate_file_in_parallel_matches(self):
+        """test that splitting the devices among processes
+        gives exactly the same output"""
+        sample = Path(__file__).parent.parent / "sample_input.txt"
+        outputs = []
+        for processes in [1, 3]:
+            with redirect_stdout(StringIO()) as output:
+                simulate_file(sample, processes=processes)
+            outputs.append(output.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_simulate_file_in_parallel_ties_match(self):
+        """test that events at the same time come out in the same order
+        in parallel, whichever processes their devices are in"""
+        lines = ["LENGTH 700"] + [f"DEVICE {i}" for i in range(6)]
+        for i in range(6):
+            lines.append(f"PROPAGATE {i} {(i + 1) % 6} 100")
+            lines.append(f"PROPAGATE {i} {(i + 3) % 6} 100")
+        lines += ["ALERT 0 OhNo 0", "ALERT 3 OhNo 0", "ALERT 2 Uh-oh 100",
+                  "CANCEL 4 OhNo 200", "CANCEL 1 Uh-oh 200"]
+        with tempfile.TemporaryDirectory() as directory:
+            scenario = Path(directory) / "ring.txt"
+            scenario.write_text("\n".join(lines) + "\n")
+            outputs = []
+            for processes in [1, 2, 4]:
+                with redirect_stdout(StringIO()) as output:
+                    simulate_file(scenario, processes=processes)
+                outputs.append(output.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0], outputs[2])
+
+    def test_simulate_file_in_parallel_formats_in_partitions(self):
+        """test that the messages are written by the processes the devices
+        are split among, and only merged by the one that started them"""
+        class MessagesOutput(TextOutput):
+            """A text output that counts the messages given to it"""
+            messages = 0
+
+            def alert_sent(self, *arguments):
+                MessagesOutput.messages += 1
+
+            alert_received = cancellation_sent = cancellation_received = (
+                alert_sent)
+
+        sample = Path(__file__).parent.parent / "sample_input.txt"
+        text = StringIO()
+        simulate_file(sample, MessagesOutput(text), processes=2)
+        self.assertEqual(MessagesOutput.messages, 0)
+        self.assertEqual(
+            text.getvalue(),
+            (Path(__file__).parent.parent / "sample_output.txt").read_text())
+
+    def test_simulate_file_in_parallel_keeps_large_blocks(self):
+        """test that an event writing more messages than a text output
+        holds before writing them still has them all written in order"""
+        lines = ["LENGTH 100"] + [f"DEVICE {i}" for i in range(2500)]
+        lines += [f"PROPAGATE 0 {i} 50" for i in range(1, 2500)]
+        lines += ["ALERT 0 OhNo 0"]
+        with tempfile.TemporaryDirectory() as directory:
+            scenario = Path(directory) / "fan.txt"
+            scenario.write_text("\n".join(lines) + "\n")
+            outputs = []
+            for processes in [1, 2]:
+                text = StringIO()
+                simulate_file(scenario, TextOutput(text), processes=processes)
+                outputs.append(text.getvalue())
+        self.assertGreater(len(outputs[0]), 1 << 16)
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_run_batch_with_partitions(self):
+        """test that a batch can split each simulation among processes"""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / "one.txt").write_text(TestBatch.scenario)
+            report = run_batch(
+                [directory / "one.txt"], directory / "out", partitions=2
+            )
+            messages = (directory / "out" / "one.out").read_text()
+        self.assertEqual(report.failures, {})
+        self.assertTrue(messages.startswith(
+            "@200: #1 SENT ALERT TO #2: Badness\n"))
+        self.assertTrue(messages.endswith("@900: END\n"))
+
+
 if __name__ == '__main__':
     unittest.main()